@@ -2,6 +2,7 @@ import streamlit as st
 import logging
 import sys
 import os
+import atexit
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT_DIR not in sys.path:
@@ -29,18 +30,28 @@ from ui.chat_interface import render_tea_chat_interface
 
 logger = logging.getLogger(__name__)
 
+@st.cache_resource(show_spinner="Inicializando asistente...")
+def get_orchestrator() -> ConversationOrchestrator:
+    """
+    Orquestador único por proceso.
+    Se crea una sola vez y lo comparten todas las sesiones del navegador;
+    la memoria de cada sesión queda aislada dentro del agente.
+    """
+    orchestrator = ConversationOrchestrator()
+    # Detener hilos en segundo plano al terminar el proceso
+    atexit.register(orchestrator.shutdown)
+    logger.info("Orchestrator initialized successfully")
+    return orchestrator
+
 def main():
     """Punto de entrada único"""
     
     try:
-        # Instanciar orquestador (singleton en session_state)
-        if "orchestrator" not in st.session_state:
-            with st.spinner("Inicializando asistente..."):
-                st.session_state.orchestrator = ConversationOrchestrator()
-                logger.info("Orchestrator initialized successfully")
+        # Orquestador compartido (singleton de proceso)
+        orchestrator = get_orchestrator()
         
         # Renderizar interfaz TEA
-        render_tea_chat_interface(st.session_state.orchestrator)
+        render_tea_chat_interface(orchestrator)
         
     except Exception as e:
         st.error(f"Error inicializando la aplicación: {str(e)}")
@@ -2,65 +2,146 @@ import streamlit as st
 import json
 import base64
 import sys
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional
 from langchain_aws import ChatBedrock
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 
-def enhance_prompt_with_langchain(user_prompt: str) -> str:
-    """Mejora el prompt usando LangChain para mejores resultados"""
-    
-    template = """Eres un experto en generación de prompts para imágenes AI. 
+ENHANCE_TEMPLATE = """Eres un experto en generación de prompts para imágenes AI. 
     Mejora el siguiente prompt para Amazon Titan Image Generator, siguiendo estas reglas:
     
     1. Añade detalles visuales específicos
     2. Incluye estilo artístico apropiado
     3. Especifica calidad y composición
     4. Mantén el significado original
+    5. Máximo 60 palabras, en inglés, una sola línea
     
     Prompt original: {user_prompt}
     
     Prompt mejorado (solo el prompt, sin explicaciones):"""
-    
-    # En una implementación real, usarías un modelo de texto para mejorar el prompt
-    # Por ahora, simplemente añadimos detalles genéricos
-    enhanced = f"{user_prompt}, digital art, high quality, detailed, 4k resolution, professional composition"
-    
-    return enhanced
 
+# Presupuesto de latencia y memoria LRU de la mejora de prompts
+ENHANCE_TIMEOUT_SECONDS = 2.5
+ENHANCE_CACHE_SIZE = 128
+
+_enhance_cache: "OrderedDict[str, str]" = OrderedDict()
+_enhance_chains = {}
+_enhance_lock = threading.Lock()
+_enhance_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prompt-enhancer")
+
+
+def _static_enhance(user_prompt: str) -> str:
+    return f"{user_prompt}, digital art, high quality, detailed, 4k resolution, professional composition"
+
+
+def _get_enhance_chain(bedrock_client, model_id_text: str):
+    """Cadena LangChain construida una sola vez por modelo"""
+    with _enhance_lock:
+        chain = _enhance_chains.get(model_id_text)
+        if chain is None:
+            llm = ChatBedrock(
+                client=bedrock_client,
+                model_id=model_id_text,
+                model_kwargs={"temperature": 0.3, "max_tokens": 150}
+            )
+            chain = PromptTemplate.from_template(ENHANCE_TEMPLATE) | llm | StrOutputParser()
+            _enhance_chains[model_id_text] = chain
+        return chain
 
-def generate_image_from_text(bedrock_client, model_id_titan: str, prompt: str):
+
+def _remember_enhanced(key: str, future) -> None:
+    if future.exception() is not None or not future.result():
+        return
+    with _enhance_lock:
+        _enhance_cache[key] = future.result().strip().strip('"')
+        _enhance_cache.move_to_end(key)
+        while len(_enhance_cache) > ENHANCE_CACHE_SIZE:
+            _enhance_cache.popitem(last=False)
+
+
+def enhance_prompt_with_langchain(user_prompt: str, bedrock_client=None, model_id_text: Optional[str] = None,
+                                  timeout_seconds: float = ENHANCE_TIMEOUT_SECONDS) -> str:
     """
-    Retorna: ("", img_bytes) donde img_bytes es PNG bytes.
+    Mejora el prompt usando LangChain y el modelo de texto.
+    Sin modelo de texto, o si no responde a tiempo, añade detalles genéricos.
     """
-    # Mejorar el prompt usando LangChain
-    enhanced_prompt = enhance_prompt_with_langchain(prompt)
-    
+    if not bedrock_client or not model_id_text:
+        return _static_enhance(user_prompt)
+
+    key = user_prompt.strip()
+    with _enhance_lock:
+        enhanced = _enhance_cache.get(key)
+        if enhanced is not None:
+            _enhance_cache.move_to_end(key)
+            return enhanced
+
+    chain = _get_enhance_chain(bedrock_client, model_id_text)
+    future = _enhance_executor.submit(chain.invoke, {"user_prompt": key})
+    # Una respuesta tardía igual queda en memoria para la próxima vez
+    future.add_done_callback(lambda f: _remember_enhanced(key, f))
+    try:
+        enhanced = future.result(timeout=timeout_seconds)
+    except Exception:
+        # Timeout o error del modelo
+        return _static_enhance(user_prompt)
+
+    enhanced = enhanced.strip().strip('"')
+    return enhanced or _static_enhance(user_prompt)
+
+
+def _dynamic_seed() -> int:
+    return int(datetime.now().timestamp() % 10000)
+
+
+def _invoke_titan(bedrock_client, model_id_titan: str, enhanced_prompt: str, number_of_images: int = 1,
+                  seed: Optional[int] = None) -> List[bytes]:
+    """
+    Una llamada a Titan; retorna la lista de PNG bytes generados.
+    Titan es determinista para un mismo seed: llamadas paralelas con el mismo
+    prompt deben recibir seeds distintos o devuelven las mismas imágenes.
+    """
+    if seed is None:
+        seed = _dynamic_seed()
     payload = {
         "taskType": "TEXT_IMAGE",
         "textToImageParams": {"text": str(enhanced_prompt)},
         "imageGenerationConfig": {
-            "numberOfImages": 1,
+            "numberOfImages": number_of_images,
             "height": 1024,
             "width": 1024,
             "cfgScale": 8,
-            "seed": int(datetime.now().timestamp() % 10000),  # Seed dinámico
+            "seed": seed % TITAN_MAX_SEED,
             "quality": "standard",  # Cambiado a premium para mejor calidad
         },
     }
 
-    with st.spinner("🎨 Generating image with AI magic..."):
-        response = bedrock_client.invoke_model(
-            modelId=model_id_titan,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(payload),
-        )
+    response = bedrock_client.invoke_model(
+        modelId=model_id_titan,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(payload),
+    )
 
     data = json.loads(response["body"].read())
-    img_b64 = data["images"][0]
-    img_bytes = base64.b64decode(img_b64)
+    return [base64.b64decode(img_b64) for img_b64 in data["images"]]
+
+
+def generate_image_from_text(bedrock_client, model_id_titan: str, prompt: str, model_id_text: Optional[str] = None):
+    """
+    Retorna: (enhanced_prompt, img_bytes) donde img_bytes es PNG bytes.
+    """
+    # Mejorar el prompt usando LangChain
+    enhanced_prompt = enhance_prompt_with_langchain(prompt, bedrock_client, model_id_text)
+
+    with st.spinner("🎨 Generating image with AI magic..."):
+        img_bytes = _invoke_titan(bedrock_client, model_id_titan, enhanced_prompt)[0]
+
     return enhanced_prompt, img_bytes
 
 
@@ -70,6 +151,7 @@ def render_image_generator(
     model_id_titan: str,
     check_image_limit_fn,
     increment_image_count_fn,
+    model_id_text: Optional[str] = None,
 ) -> None:
     
     st.title("🎨 Ignacio Connect - AI Image Generator")
@@ -193,7 +275,8 @@ def render_image_generator(
                     enhanced_prompt, img_bytes = generate_image_from_text(
                         bedrock_client,
                         model_id_titan,
-                        prompt
+                        prompt,
+                        model_id_text=model_id_text
                     )
                     
                     # Guardar en historial
@@ -251,11 +334,127 @@ def render_image_generator(
                     st.caption(f"📏 {img_data['size']}")
 
 
+# Titan acepta como máximo 5 imágenes por llamada
+TITAN_MAX_IMAGES_PER_CALL = 5
+TITAN_MAX_SEED = 2147483647  # Titan acepta seeds de 0 a 2147483646
+
+
+class BatchImageResult(NamedTuple):
+    """Resultado de un elemento del batch (image_bytes o error, nunca ambos)"""
+    index: int
+    prompt: str
+    enhanced_prompt: str
+    image_bytes: Optional[bytes]
+    error: Optional[str]
+
+
+class ImageBatchRun:
+    """
+    Ejecución de un batch de prompts.
+    - Los prompts repetidos se agrupan en una sola llamada con numberOfImages;
+      si no caben en una, cada llamada usa un seed distinto (base + índice)
+    - Las llamadas corren en paralelo con un máximo de max_concurrency
+    - Al iterar, los resultados llegan en orden de finalización
+    - Un error solo afecta a los elementos de esa llamada
+    """
+
+    def __init__(self, bedrock_client, model_id_titan: str, prompts: List[str], max_concurrency: int = 4,
+                 model_id_text: Optional[str] = None):
+        self.bedrock_client = bedrock_client
+        self.model_id_titan = model_id_titan
+        self.model_id_text = model_id_text
+        self.prompts = list(prompts)
+        self.max_concurrency = max(1, max_concurrency)
+
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _plan_calls(self) -> List[List[int]]:
+        """Agrupa los índices por prompt y los parte en llamadas de hasta 5 imágenes"""
+        groups: "OrderedDict[str, List[int]]" = OrderedDict()
+        for index, prompt in enumerate(self.prompts):
+            groups.setdefault(prompt.strip(), []).append(index)
+
+        calls = []
+        for indices in groups.values():
+            for start in range(0, len(indices), TITAN_MAX_IMAGES_PER_CALL):
+                calls.append(indices[start:start + TITAN_MAX_IMAGES_PER_CALL])
+        return calls
+
+    def _run_call(self, indices: List[int], seed: int) -> List[BatchImageResult]:
+        prompt = self.prompts[indices[0]]
+        enhanced_prompt = enhance_prompt_with_langchain(prompt, self.bedrock_client, self.model_id_text)
+        images = _invoke_titan(self.bedrock_client, self.model_id_titan, enhanced_prompt, len(indices), seed=seed)
+        return [
+            BatchImageResult(index, prompt, enhanced_prompt, images[i] if i < len(images) else None,
+                             None if i < len(images) else "Titan returned fewer images than requested")
+            for i, index in enumerate(indices)
+        ]
+
+    def __iter__(self) -> Iterator[BatchImageResult]:
+        self.started_at = time.time()
+        calls = self._plan_calls()
+        self.calls = len(calls)
+        base_seed = _dynamic_seed()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(self._run_call, indices, base_seed + call_index): indices
+                for call_index, indices in enumerate(calls)
+            }
+            for future in as_completed(futures):
+                indices = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [
+                        BatchImageResult(index, self.prompts[index], "", None, str(e))
+                        for index in indices
+                    ]
+
+                for result in results:
+                    if result.error:
+                        self.failed += 1
+                    else:
+                        self.succeeded += 1
+                    yield result
+
+        self.finished_at = time.time()
+
+    def get_stats(self) -> dict:
+        """Throughput agregado del batch"""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "prompts": len(self.prompts),
+            "calls": self.calls,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 2),
+            "images_per_second": round(self.succeeded / elapsed, 3) if elapsed > 0 else 0.0
+        }
+
+
+def generate_images_batch(bedrock_client, model_id_titan: str, prompts: List[str], max_concurrency: int = 4,
+                          model_id_text: Optional[str] = None) -> ImageBatchRun:
+    """
+    Crea un batch de generación. Iterar el objeto retornado produce
+    BatchImageResult en orden de finalización; get_stats() da el throughput.
+    """
+    return ImageBatchRun(bedrock_client, model_id_titan, prompts, max_concurrency=max_concurrency,
+                         model_id_text=model_id_text)
+
+
 # Función adicional para batch processing
-def generate_multiple_images(bedrock_client, model_id_titan: str, prompts: list):
-    """Genera múltiples imágenes en batch"""
-    results = []
-    for prompt in prompts:
-        _, img_bytes = generate_image_from_text(bedrock_client, model_id_titan, prompt)
-        results.append(img_bytes)
+def generate_multiple_images(bedrock_client, model_id_titan: str, prompts: list, max_concurrency: int = 4,
+                             model_id_text: Optional[str] = None):
+    """Genera múltiples imágenes en batch (resultado en el orden de los prompts)"""
+    results: List[Optional[bytes]] = [None] * len(prompts)
+    for item in generate_images_batch(bedrock_client, model_id_titan, prompts, max_concurrency, model_id_text):
+        if item.error:
+            raise RuntimeError(f"Error generating image {item.index}: {item.error}")
+        results[item.index] = item.image_bytes
     return results
\ No newline at end of file
@@ -34,6 +34,7 @@ AWS_BEDROCK_REGION = st.secrets["AWS"]["AWS_BEDROCK_REGION"]
 AWS_DYNAMODB_REGION = st.secrets["AWS"]["AWS_DYNAMODB_REGION"]
 AWS_BEDROCK_AI_MODELO_DEEPSEEK = st.secrets["AWS"]["AWS_BEDROCK_AI_MODELO_DEEPSEEK"]
 AWS_BEDROCK_AI_MODELO_TITAN = st.secrets["AWS"]["AWS_BEDROCK_AI_MODELO_TITAN"]
+AWS_BEDROCK_AI_MODELO_CLAUDE = st.secrets["AWS"].get("AWS_BEDROCK_AI_MODELO_CLAUDE")
 
 MAX_IMAGENES_PER_DAY = int(st.secrets["FEATURES"]["MAX_IMAGENES_PER_DAY"])
 GCP_SERVICE_ACCOUNT_B64 = st.secrets["GCP_SERVICE_ACCOUNT"]["GCP_SERVICE_ACCOUNT_B64"]
@@ -158,6 +159,7 @@ def main():
             model_id_titan=AWS_BEDROCK_AI_MODELO_TITAN,
             check_image_limit_fn=check_image_limit,
             increment_image_count_fn=increment_image_count,
+            model_id_text=AWS_BEDROCK_AI_MODELO_CLAUDE,
         )
 
     st.sidebar.markdown("---")
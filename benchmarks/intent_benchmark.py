@@ -0,0 +1,160 @@
+"""
+Benchmark de detección de intención: reglas de palabras clave vs clasificador local.
+
+Uso:
+    python benchmarks/intent_benchmark.py
+
+Mide exactitud (validación cruzada k-fold sobre config/intent_corpus.py)
+y latencia media por mensaje de:
+- legacy: reglas originales con `in` sobre subcadenas
+- matcher: IntentMatcher compilado (config/constants.INTENT_KEYWORDS)
+- classifier: IntentClassifier (Naive Bayes de n-gramas) como veto del
+  matcher, igual que en el agente: solo se dispara una tool si hay palabra
+  clave, y se descarta si el clasificador dice "chat" con confianza >= umbral
+
+Además de la exactitud global se reporta el recall por intención: la
+fracción de solicitudes reales de imagen/expansión que terminan en su tool.
+
+Solo se usan las tablas de palabras clave de las intenciones etiquetadas en el
+corpus: ask_general (preguntas USIL/SIU) se despacha solo por palabras clave.
+"""
+
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from config.intent_corpus import INTENT_CORPUS
+from config.constants import INTENT_KEYWORDS
+from core.intent_classifier import IntentClassifier, CHAT_INTENT
+from core.intent_matcher import IntentMatcher
+
+FOLDS = 5
+CONFIDENCE_THRESHOLD = 0.5
+LATENCY_ROUNDS = 200
+
+CORPUS_LABELS = {label for _, label in INTENT_CORPUS}
+BENCHMARK_KEYWORDS = {intent: kws for intent, kws in INTENT_KEYWORDS.items() if intent in CORPUS_LABELS}
+
+# Reglas previas a IntentMatcher, copiadas tal cual para comparar
+LEGACY_IMAGE_KEYWORDS = [
+    'genera', 'dibuja', 'crea una imagen', 'imagen de', 'imagen sobre',
+    'generate', 'draw', 'create an image', 'picture of', 'imagen',
+    'dibujar', 'crear imagen', 'haz una imagen', 'quiero una imagen'
+]
+LEGACY_EXPAND_KEYWORDS = [
+    'más detalles', 'explica paso a paso', 'expandir', 'más información',
+    'more details', 'step by step', 'explain more', 'detalles',
+    'explicación detallada', 'ampliar', 'desarrolla'
+]
+
+
+def legacy_predict(message: str) -> str:
+    message_lower = message.lower()
+    if any(kw in message_lower for kw in LEGACY_IMAGE_KEYWORDS):
+        return "generate_image"
+    if any(kw in message_lower for kw in LEGACY_EXPAND_KEYWORDS):
+        return "expand_explanation"
+    return CHAT_INTENT
+
+
+def matcher_predictor() -> Callable[[str], str]:
+    matcher = IntentMatcher(BENCHMARK_KEYWORDS)
+
+    def predict(message: str) -> str:
+        match = matcher.match(message)
+        return match.intent if match else CHAT_INTENT
+
+    return predict
+
+
+def classifier_predictor(classifier: IntentClassifier) -> Callable[[str], str]:
+    matcher = IntentMatcher(BENCHMARK_KEYWORDS)
+
+    def predict(message: str) -> str:
+        match = matcher.match(message)
+        if not match:
+            return CHAT_INTENT
+        intent, confidence = classifier.predict(message)
+        return CHAT_INTENT if intent == CHAT_INTENT and confidence >= CONFIDENCE_THRESHOLD else match.intent
+
+    return predict
+
+
+def accuracy(predict: Callable[[str], str], samples: List[Tuple[str, str]]) -> Tuple[int, int]:
+    correct = sum(1 for text, label in samples if predict(text) == label)
+    return correct, len(samples)
+
+
+def recall(predict: Callable[[str], str], samples: List[Tuple[str, str]], intent: str) -> Tuple[int, int]:
+    """Solicitudes reales de la intención que terminan en su tool"""
+    positives = [text for text, label in samples if label == intent]
+    hits = sum(1 for text in positives if predict(text) == intent)
+    return hits, len(positives)
+
+
+def latency_us(predict: Callable[[str], str], samples: List[Tuple[str, str]]) -> float:
+    start = time.perf_counter()
+    for _ in range(LATENCY_ROUNDS):
+        for text, _ in samples:
+            predict(text)
+    elapsed = time.perf_counter() - start
+    return elapsed / (LATENCY_ROUNDS * len(samples)) * 1e6
+
+
+def false_image_rate(predict: Callable[[str], str], samples: List[Tuple[str, str]]) -> Tuple[int, int]:
+    """Mensajes que no piden imagen pero dispararían una generación"""
+    negatives = [text for text, label in samples if label != "generate_image"]
+    fired = sum(1 for text in negatives if predict(text) == "generate_image")
+    return fired, len(negatives)
+
+
+def main(seed: Optional[int] = 7) -> None:
+    samples = list(INTENT_CORPUS)
+    random.Random(seed).shuffle(samples)
+
+    def evaluate(predict: Callable[[str], str], subset: List[Tuple[str, str]]) -> List[Tuple[int, int]]:
+        return [
+            accuracy(predict, subset),
+            false_image_rate(predict, subset),
+            recall(predict, subset, "generate_image"),
+            recall(predict, subset, "expand_explanation"),
+        ]
+
+    # Las reglas no se entrenan: se evalúan sobre todo el corpus
+    results = {
+        "legacy": evaluate(legacy_predict, samples),
+        "matcher": evaluate(matcher_predictor(), samples),
+    }
+
+    # El clasificador se evalúa con validación cruzada (se suman los folds)
+    totals = [(0, 0)] * 4
+    for fold in range(FOLDS):
+        test = samples[fold::FOLDS]
+        train = [s for i, s in enumerate(samples) if i % FOLDS != fold]
+        fold_results = evaluate(classifier_predictor(IntentClassifier().fit(train)), test)
+        totals = [(a + c, b + t) for (a, b), (c, t) in zip(totals, fold_results)]
+    results["classifier"] = totals
+
+    full_classifier = IntentClassifier().fit(samples)
+    latencies = {
+        "legacy": latency_us(legacy_predict, samples),
+        "matcher": latency_us(matcher_predictor(), samples),
+        "classifier": latency_us(classifier_predictor(full_classifier), samples),
+    }
+
+    print(f"Corpus: {len(samples)} mensajes, {FOLDS}-fold CV, umbral {CONFIDENCE_THRESHOLD}")
+    print(f"{'metodo':<12}{'exactitud':>12}{'imagenes falsas':>18}{'recall imagen':>16}"
+          f"{'recall expansion':>19}{'latencia (us)':>16}")
+    for name, ((c, t), (f, n), (ih, it), (eh, et)) in results.items():
+        print(f"{name:<12}{c / t:>12.1%}{f'{f}/{n}':>18}{f'{ih}/{it}':>16}"
+              f"{f'{eh}/{et}':>19}{latencies[name]:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
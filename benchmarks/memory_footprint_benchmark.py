@@ -0,0 +1,118 @@
+"""
+Benchmark de memoria por sesión: registros dict vs ChatMessage compacto.
+
+Uso:
+    python benchmarks/memory_footprint_benchmark.py [sesiones]
+
+Con tracemalloc mide los bytes retenidos por sesión al llenar N sesiones
+con conversaciones típicas (ventana completa de 40 mensajes) usando:
+- legacy: la memoria anterior (dict por mensaje, rol str, timestamp ISO-8601,
+  last_accessed con datetime.now() en cada append)
+- compact: RAMConversationMemory actual (ChatMessage con __slots__, enum Role,
+  timestamps float epoch)
+"""
+
+import math
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.memory import RAMConversationMemory
+
+SESSIONS = 2000
+MESSAGES_PER_SESSION = 20
+SEED = 7
+
+USER_MESSAGES = [
+    "Hola",
+    "Gracias",
+    "¿Qué comen los perros?",
+    "¿Cuántos planetas hay en el sistema solar?",
+    "Quiero estudiar ingeniería, ¿qué carreras tiene SIU?",
+    "Dame más detalles",
+]
+ASSISTANT_MESSAGE = (
+    "Los perros comen croquetas y carne cocida. "
+    "No deben comer chocolate ni uvas. "
+    "Pregunta a un veterinario si tienes dudas."
+)
+
+
+class LegacyConversationMemory:
+    """Copia reducida de la memoria anterior, solo para comparar"""
+
+    def __init__(self, max_messages: int = 20):
+        self.max_messages = max_messages * 2
+        self.messages = deque(maxlen=self.max_messages)
+        self.session_id = None
+        self.created_at = datetime.now()
+        self.last_accessed = datetime.now()
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    def _append(self, role: str, content: str) -> None:
+        with self._lock:
+            self.messages.append({
+                "role": role,
+                "content": content,
+                "tokens": math.ceil(len(content) / 3.5) + 4,
+                "seq": self._next_seq,
+                "timestamp": datetime.now().isoformat()
+            })
+            self._next_seq += 1
+        self.last_accessed = datetime.now()
+
+    def add_user_message(self, content: str) -> None:
+        self._append("user", content)
+
+    def add_ai_message(self, content: str) -> None:
+        self._append("assistant", content)
+
+
+def fill_sessions(factory, sessions: int):
+    rng = random.Random(SEED)
+    store = {}
+    for i in range(sessions):
+        memory = factory(MESSAGES_PER_SESSION)
+        memory.session_id = f"session_{i}"
+        for _ in range(MESSAGES_PER_SESSION):
+            # Copias nuevas: como llegarían desde la red, no literales compartidos
+            memory.add_user_message("".join(list(rng.choice(USER_MESSAGES))))
+            memory.add_ai_message("".join(list(ASSISTANT_MESSAGE)))
+        store[memory.session_id] = memory
+    return store
+
+
+def measure(factory, sessions: int) -> int:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = fill_sessions(factory, sessions)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return (current - baseline) // sessions
+
+
+def main() -> None:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS
+
+    legacy = measure(LegacyConversationMemory, sessions)
+    compact = measure(RAMConversationMemory, sessions)
+
+    print(f"Sesiones: {sessions}, mensajes por sesión: {MESSAGES_PER_SESSION * 2}")
+    print(f"{'memoria':<10}{'bytes/sesión':>15}{'bytes/mensaje':>16}")
+    for name, per_session in (("legacy", legacy), ("compact", compact)):
+        print(f"{name:<10}{per_session:>15,}{per_session // (MESSAGES_PER_SESSION * 2):>16,}")
+    print(f"Ahorro: {1 - compact / legacy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
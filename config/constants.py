@@ -776,4 +776,24 @@ TOOL_DESCRIPTIONS = {
     "expand_explanation": """Expande la respuesta anterior con explicacion detallada paso a paso.
     Input: tema especifico a expandir.
     Usala SOLO cuando usuario pida 'mas detalles' o 'explica paso a paso'."""
-}
\ No newline at end of file
+}
+
+# Palabras clave por intención, en orden de prioridad.
+# El matcher las compila una sola vez en una expresión regular con límites de palabra.
+INTENT_KEYWORDS = {
+    "generate_image": [
+        'genera', 'dibuja', 'crea una imagen', 'imagen de', 'imagen sobre',
+        'generate', 'draw', 'create an image', 'picture of', 'imagen',
+        'dibujar', 'crear imagen', 'haz una imagen', 'quiero una imagen'
+    ],
+    "expand_explanation": [
+        'más detalles', 'mas detalles', 'explica paso a paso', 'expandir',
+        'más información', 'mas informacion', 'more details', 'step by step',
+        'explain more', 'detalles', 'explicación detallada', 'explicacion detallada',
+        'ampliar', 'desarrolla'
+    ],
+    "ask_general": [
+        'usil', 'siu', 'san ignacio university', 'universidad san ignacio',
+        'san ignacio de loyola'
+    ]
+}
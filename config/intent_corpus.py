@@ -0,0 +1,182 @@
+"""Corpus etiquetado para el clasificador local de intención.
+
+Etiquetas:
+- chat: conversación normal (incluye frases con "imagen", "genera" o "detalles"
+  que NO piden una imagen ni ampliar la respuesta anterior)
+- generate_image: pide generar/dibujar una imagen
+- expand_explanation: pide ampliar la respuesta anterior paso a paso
+"""
+
+INTENT_CORPUS = [
+    # === chat ===
+    ("Hola, ¿cómo estás?", "chat"),
+    ("Hola", "chat"),
+    ("Buenos días Ignatius", "chat"),
+    ("¿Qué comen los perros?", "chat"),
+    ("¿Los gatos ven colores?", "chat"),
+    ("¿Cuántos planetas hay en el sistema solar?", "chat"),
+    ("Quiero estudiar medicina, ¿dónde puedo estudiar?", "chat"),
+    ("¿Qué carreras tiene San Ignacio University?", "chat"),
+    ("¿Cuánto cuesta estudiar en USIL?", "chat"),
+    ("¿Dónde queda el campus de SIU?", "chat"),
+    ("¿Cuáles son los requisitos de admisión de USIL?", "chat"),
+    ("¿Cuáles son los detalles de la admisión en USIL?", "chat"),
+    ("Estoy triste hoy", "chat"),
+    ("Estoy enojado con mi hermano", "chat"),
+    ("¿Qué genera la energía solar?", "chat"),
+    ("¿Cómo se genera la electricidad?", "chat"),
+    ("La imaginación es muy importante para los niños", "chat"),
+    ("Tengo mucha imaginación", "chat"),
+    ("Me gusta dibujar en la escuela", "chat"),
+    ("Mi imagen favorita es la de mi perro", "chat"),
+    ("¿Qué significa la palabra imagen?", "chat"),
+    ("¿Qué es un generador eléctrico?", "chat"),
+    ("Cuéntame un dato sobre los dinosaurios", "chat"),
+    ("¿Qué hago si estoy nervioso antes de un examen?", "chat"),
+    ("¿Cómo saludo a un compañero nuevo?", "chat"),
+    ("Gracias por tu ayuda", "chat"),
+    ("Adiós", "chat"),
+    ("¿Qué hora es en Miami?", "chat"),
+    ("¿Cuál es la capital de Perú?", "chat"),
+    ("Recomiéndame una película de ciencia ficción", "chat"),
+    ("¿Quién escribió Cien años de soledad?", "chat"),
+    ("¿Cómo se juega al fútbol?", "chat"),
+    ("¿Qué frutas son saludables?", "chat"),
+    ("Responde en español por favor", "chat"),
+    ("No entiendo tu respuesta", "chat"),
+    ("Hello, how are you?", "chat"),
+    ("What do dogs eat?", "chat"),
+    ("What careers does SIU offer?", "chat"),
+    ("How much does it cost to study at USIL?", "chat"),
+    ("I want to be an engineer", "chat"),
+    ("What is the weather like in Miami?", "chat"),
+    ("Tell me about Mars", "chat"),
+    ("I like to draw with my sister", "chat"),
+    ("What generates electricity in a battery?", "chat"),
+    ("My imagination is very big", "chat"),
+    ("What does the word picture mean?", "chat"),
+    ("Thank you very much", "chat"),
+    ("I am sad today", "chat"),
+    ("Can you help me with my homework?", "chat"),
+    ("What are the details of the SIU scholarship?", "chat"),
+    # Respuestas cortas y despedidas: no deben disparar ninguna tool
+    ("ok", "chat"),
+    ("Ok gracias", "chat"),
+    ("jaja", "chat"),
+    ("jajaja qué chistoso", "chat"),
+    ("claro", "chat"),
+    ("sí", "chat"),
+    ("no", "chat"),
+    ("vale", "chat"),
+    ("bueno", "chat"),
+    ("listo", "chat"),
+    ("perfecto", "chat"),
+    ("entendido", "chat"),
+    ("de acuerdo", "chat"),
+    ("genial", "chat"),
+    ("chao", "chat"),
+    ("nos vemos", "chat"),
+    ("hasta luego", "chat"),
+    ("bye", "chat"),
+    ("goodbye", "chat"),
+    ("see you later", "chat"),
+    ("ok thanks", "chat"),
+    ("cool", "chat"),
+    ("yes", "chat"),
+    ("lol", "chat"),
+
+    # === generate_image ===
+    ("Genera una imagen de un gato astronauta", "generate_image"),
+    ("Genera una imagen de la universidad", "generate_image"),
+    ("Dibuja un perro jugando en el parque", "generate_image"),
+    ("Dibújame un dinosaurio verde", "generate_image"),
+    ("Crea una imagen de un cohete en el espacio", "generate_image"),
+    ("Quiero una imagen de un castillo", "generate_image"),
+    ("Haz una imagen de un campus moderno", "generate_image"),
+    ("Hazme un dibujo de un caballo", "generate_image"),
+    ("Imagen de un robot estudiando", "generate_image"),
+    ("Imagen sobre el sistema solar", "generate_image"),
+    ("Crear imagen de una biblioteca futurista", "generate_image"),
+    ("Puedes dibujar una casa con un jardín", "generate_image"),
+    ("¿Puedes generar una imagen de la luna?", "generate_image"),
+    ("Quiero ver un dibujo de un búho", "generate_image"),
+    ("Muéstrame una imagen de un tigre", "generate_image"),
+    ("Genera un dibujo de estudiantes en clase", "generate_image"),
+    ("Dibuja el planeta Saturno", "generate_image"),
+    ("Genera una ilustración de un barco", "generate_image"),
+    ("Crea un dibujo de una ciudad de noche", "generate_image"),
+    ("Haz un dibujo de mi gato", "generate_image"),
+    ("Me puedes hacer una imagen de un unicornio", "generate_image"),
+    ("Quiero que dibujes un árbol", "generate_image"),
+    ("Genera la imagen de un chef cocinando", "generate_image"),
+    ("Pinta un paisaje con montañas", "generate_image"),
+    ("Generate an image of a cat", "generate_image"),
+    ("Draw a dog in the park", "generate_image"),
+    ("Create an image of a futuristic university", "generate_image"),
+    ("Picture of a rocket launching", "generate_image"),
+    ("Can you draw a dinosaur?", "generate_image"),
+    ("Make a picture of a horse", "generate_image"),
+    ("I want an image of the ocean", "generate_image"),
+    ("Show me a drawing of a castle", "generate_image"),
+    ("Generate a picture of students studying", "generate_image"),
+    ("Please draw a red car", "generate_image"),
+    ("Paint a sunset over the sea", "generate_image"),
+    ("Create a drawing of a robot teacher", "generate_image"),
+    ("Dibuja una flor amarilla", "generate_image"),
+    ("Dibuja un gato durmiendo", "generate_image"),
+    ("Dibuja la luna llena", "generate_image"),
+    ("Dibuja un avión", "generate_image"),
+    ("Genera un paisaje de playa", "generate_image"),
+    ("Genera un robot amigable", "generate_image"),
+    ("Imagen de un volcán", "generate_image"),
+    ("Imagen sobre los océanos", "generate_image"),
+    ("Quiero una imagen de mi escuela", "generate_image"),
+    ("Draw a cat", "generate_image"),
+    ("Draw a house with a garden", "generate_image"),
+    ("Draw the moon and the stars", "generate_image"),
+    ("Can you draw a train?", "generate_image"),
+    ("Generate a dragon", "generate_image"),
+    ("Picture of a forest in autumn", "generate_image"),
+
+    # === expand_explanation ===
+    ("Dame más detalles", "expand_explanation"),
+    ("Quiero más detalles de eso", "expand_explanation"),
+    ("Explica paso a paso", "expand_explanation"),
+    ("Explícame eso paso a paso", "expand_explanation"),
+    ("Puedes expandir tu respuesta", "expand_explanation"),
+    ("Dame más información sobre eso", "expand_explanation"),
+    ("Necesito una explicación detallada", "expand_explanation"),
+    ("Amplía la explicación", "expand_explanation"),
+    ("Puedes ampliar lo que dijiste", "expand_explanation"),
+    ("Desarrolla más esa idea", "expand_explanation"),
+    ("No entendí, explícalo con más detalle", "expand_explanation"),
+    ("Cuéntame más sobre eso", "expand_explanation"),
+    ("Explica mejor lo anterior", "expand_explanation"),
+    ("Quiero los pasos uno por uno", "expand_explanation"),
+    ("Dime los detalles de tu respuesta anterior", "expand_explanation"),
+    ("Más detalles por favor", "expand_explanation"),
+    ("Profundiza en ese tema", "expand_explanation"),
+    ("Explícame con más calma", "expand_explanation"),
+    ("Sigue explicando", "expand_explanation"),
+    ("Dame un paso a paso", "expand_explanation"),
+    ("More details please", "expand_explanation"),
+    ("Explain step by step", "expand_explanation"),
+    ("Can you explain more?", "expand_explanation"),
+    ("Tell me more about that", "expand_explanation"),
+    ("Give me a detailed explanation", "expand_explanation"),
+    ("Expand your answer", "expand_explanation"),
+    ("I need more information about that", "expand_explanation"),
+    ("Go deeper into that", "expand_explanation"),
+    ("Break it down step by step", "expand_explanation"),
+    ("Explain that again in more detail", "expand_explanation"),
+    ("Amplía eso", "expand_explanation"),
+    ("Puedes ampliar la respuesta", "expand_explanation"),
+    ("Ampliar la explicación anterior", "expand_explanation"),
+    ("Desarrolla eso", "expand_explanation"),
+    ("Desarrolla tu respuesta", "expand_explanation"),
+    ("Dame más detalles", "expand_explanation"),
+    ("Quiero detalles de lo que dijiste", "expand_explanation"),
+    ("Necesito más información de eso", "expand_explanation"),
+    ("Explain more please", "expand_explanation"),
+    ("More details about that", "expand_explanation"),
+]
@@ -14,12 +14,72 @@ class Settings(BaseSettings):
     # Bedrock Models
     bedrock_text_model_id: str = Field(default="us.anthropic.claude-3-5-haiku-20241022-v1:0")
     bedrock_image_model_id: str = Field(default="amazon.titan-image-generator-v2:0")
+    bedrock_prompt_caching: bool = Field(default=True)
+    bedrock_summary_model_id: str = Field(default="")
+    
+    # Bedrock retries / circuit breaker
+    bedrock_max_attempts: int = Field(default=4)
+    bedrock_backoff_base_seconds: float = Field(default=0.5)
+    bedrock_backoff_max_seconds: float = Field(default=8.0)
+    bedrock_breaker_failure_threshold: int = Field(default=5)
+    bedrock_breaker_reset_seconds: float = Field(default=30.0)
     
     # DynamoDB
     dynamodb_image_usage_table: str = Field(default="tbl_image_usage")
     
+    # Conversation persistence ("none", "memory", "sqlite", "dynamodb")
+    conversation_store_backend: str = Field(default="sqlite")
+    conversation_store_sqlite_path: str = Field(default=".cache/conversations.db")
+    conversation_store_dynamodb_table: str = Field(default="tbl_conversations")
+    conversation_store_dynamodb_endpoint: str = Field(default="")
+    conversation_store_ttl_seconds: int = Field(default=7 * 24 * 3600)
+    conversation_store_flush_seconds: float = Field(default=1.0)
+    
     # Limits
     max_images_per_day: int = Field(default=5)
+    max_sessions: int = Field(default=1000)
+    session_idle_ttl_seconds: int = Field(default=1800)
+    session_sweep_interval_seconds: int = Field(default=60)
+    
+    # Image jobs
+    image_job_workers: int = Field(default=2)
+    image_job_max_pending: int = Field(default=20)
+    image_job_max_pending_per_user: int = Field(default=2)
+    image_job_retention_seconds: int = Field(default=600)
+    
+    # Image cache (disk, content-addressed)
+    image_cache_enabled: bool = Field(default=False)
+    image_cache_dir: str = Field(default=".cache/images")
+    image_cache_max_mb: int = Field(default=200)
+    image_cache_seed_buckets: int = Field(default=4)
+    image_cache_charge_quota_on_hit: bool = Field(default=True)
+    
+    # Image history (chat UI)
+    image_history_dir: str = Field(default=".cache/history")
+    image_history_thumb_px: int = Field(default=200)
+    image_history_max_thumbnails: int = Field(default=500)
+    image_history_retention_hours: int = Field(default=24)
+    context_max_input_tokens: int = Field(default=2000)
+    
+    # Intent classifier
+    intent_classifier_enabled: bool = Field(default=True)
+    # Confianza mínima en "chat" para descartar una coincidencia de palabras clave
+    intent_confidence_threshold: float = Field(default=0.5)
+    
+    # Conversation summary
+    summary_enabled: bool = Field(default=True)
+    summary_every_n_turns: int = Field(default=4)
+    
+    # Image prompt enhancement
+    prompt_enhancer_enabled: bool = Field(default=True)
+    prompt_enhancer_model_id: str = Field(default="")
+    prompt_enhancer_timeout_seconds: float = Field(default=2.5)
+    prompt_enhancer_cache_size: int = Field(default=256)
+    
+    # Response cache
+    response_cache_enabled: bool = Field(default=True)
+    response_cache_max_entries: int = Field(default=500)
+    response_cache_ttl_seconds: int = Field(default=3600)
     
     # TEA Configuration
     tea_default_verbosity: str = Field(default="brief")  # brief, detailed, step_by_step
@@ -45,12 +105,68 @@ class Settings(BaseSettings):
             # Bedrock
             settings.bedrock_text_model_id = st.secrets.get("AWS",{}).get("AWS_BEDROCK_AI_MODELO_CLAUDE", settings.bedrock_text_model_id)
             settings.bedrock_image_model_id = st.secrets.get("AWS",{}).get("AWS_BEDROCK_AI_MODELO_TITAN", settings.bedrock_image_model_id)
+            settings.bedrock_prompt_caching = str(st.secrets.get("AWS",{}).get("AWS_BEDROCK_PROMPT_CACHING", settings.bedrock_prompt_caching)).lower() == "true"
             
             # DynamoDB
             settings.dynamodb_image_usage_table = st.secrets.get("AWS",{}).get("AWS_DYNAMODB_IMAGE_USAGE_TABLE", settings.dynamodb_image_usage_table)
             
+            # Conversation persistence
+            settings.conversation_store_backend = st.secrets.get("FEATURES", {}).get("CONVERSATION_STORE", settings.conversation_store_backend)
+            settings.conversation_store_sqlite_path = st.secrets.get("FEATURES", {}).get("CONVERSATION_STORE_SQLITE_PATH", settings.conversation_store_sqlite_path)
+            settings.conversation_store_dynamodb_table = st.secrets.get("AWS",{}).get("AWS_DYNAMODB_CONVERSATIONS_TABLE", settings.conversation_store_dynamodb_table)
+            settings.conversation_store_dynamodb_endpoint = st.secrets.get("AWS",{}).get("AWS_DYNAMODB_ENDPOINT_URL", settings.conversation_store_dynamodb_endpoint)
+            settings.conversation_store_ttl_seconds = int(st.secrets.get("FEATURES", {}).get("CONVERSATION_STORE_TTL_SECONDS", settings.conversation_store_ttl_seconds))
+            settings.conversation_store_flush_seconds = float(st.secrets.get("FEATURES", {}).get("CONVERSATION_STORE_FLUSH_SECONDS", settings.conversation_store_flush_seconds))
+            
             # Limits
             settings.max_images_per_day = st.secrets.get("FEATURES", {}).get("MAX_IMAGENES_PER_DAY", settings.max_images_per_day)
+            settings.max_sessions = int(st.secrets.get("FEATURES", {}).get("MAX_SESSIONS", settings.max_sessions))
+            settings.session_idle_ttl_seconds = int(st.secrets.get("FEATURES", {}).get("SESSION_IDLE_TTL_SECONDS", settings.session_idle_ttl_seconds))
+            settings.session_sweep_interval_seconds = int(st.secrets.get("FEATURES", {}).get("SESSION_SWEEP_INTERVAL_SECONDS", settings.session_sweep_interval_seconds))
+            settings.context_max_input_tokens = int(st.secrets.get("FEATURES", {}).get("CONTEXT_MAX_INPUT_TOKENS", settings.context_max_input_tokens))
+            
+            # Bedrock retries / circuit breaker
+            settings.bedrock_max_attempts = int(st.secrets.get("AWS",{}).get("AWS_BEDROCK_MAX_ATTEMPTS", settings.bedrock_max_attempts))
+            settings.bedrock_breaker_failure_threshold = int(st.secrets.get("AWS",{}).get("AWS_BEDROCK_BREAKER_FAILURES", settings.bedrock_breaker_failure_threshold))
+            settings.bedrock_breaker_reset_seconds = float(st.secrets.get("AWS",{}).get("AWS_BEDROCK_BREAKER_RESET_SECONDS", settings.bedrock_breaker_reset_seconds))
+            
+            # Image jobs
+            settings.image_job_workers = int(st.secrets.get("FEATURES", {}).get("IMAGE_JOB_WORKERS", settings.image_job_workers))
+            settings.image_job_max_pending = int(st.secrets.get("FEATURES", {}).get("IMAGE_JOB_MAX_PENDING", settings.image_job_max_pending))
+            settings.image_job_max_pending_per_user = int(st.secrets.get("FEATURES", {}).get("IMAGE_JOB_MAX_PENDING_PER_USER", settings.image_job_max_pending_per_user))
+            
+            # Image cache
+            settings.image_cache_enabled = str(st.secrets.get("CACHE", {}).get("IMAGE_CACHE_ENABLED", settings.image_cache_enabled)).lower() == "true"
+            settings.image_cache_dir = st.secrets.get("CACHE", {}).get("IMAGE_CACHE_DIR", settings.image_cache_dir)
+            settings.image_cache_max_mb = int(st.secrets.get("CACHE", {}).get("IMAGE_CACHE_MAX_MB", settings.image_cache_max_mb))
+            settings.image_cache_seed_buckets = int(st.secrets.get("CACHE", {}).get("IMAGE_CACHE_SEED_BUCKETS", settings.image_cache_seed_buckets))
+            settings.image_cache_charge_quota_on_hit = str(st.secrets.get("CACHE", {}).get("IMAGE_CACHE_CHARGE_QUOTA_ON_HIT", settings.image_cache_charge_quota_on_hit)).lower() == "true"
+            
+            # Image history
+            settings.image_history_dir = st.secrets.get("CACHE", {}).get("IMAGE_HISTORY_DIR", settings.image_history_dir)
+            settings.image_history_thumb_px = int(st.secrets.get("CACHE", {}).get("IMAGE_HISTORY_THUMB_PX", settings.image_history_thumb_px))
+            settings.image_history_max_thumbnails = int(st.secrets.get("CACHE", {}).get("IMAGE_HISTORY_MAX_THUMBNAILS", settings.image_history_max_thumbnails))
+            settings.image_history_retention_hours = int(st.secrets.get("CACHE", {}).get("IMAGE_HISTORY_RETENTION_HOURS", settings.image_history_retention_hours))
+            
+            # Intent classifier
+            settings.intent_classifier_enabled = str(st.secrets.get("FEATURES", {}).get("INTENT_CLASSIFIER_ENABLED", settings.intent_classifier_enabled)).lower() == "true"
+            settings.intent_confidence_threshold = float(st.secrets.get("FEATURES", {}).get("INTENT_CONFIDENCE_THRESHOLD", settings.intent_confidence_threshold))
+            
+            # Conversation summary
+            settings.bedrock_summary_model_id = st.secrets.get("AWS",{}).get("AWS_BEDROCK_AI_MODELO_SUMMARY", settings.bedrock_summary_model_id)
+            settings.summary_enabled = str(st.secrets.get("FEATURES", {}).get("SUMMARY_ENABLED", settings.summary_enabled)).lower() == "true"
+            settings.summary_every_n_turns = int(st.secrets.get("FEATURES", {}).get("SUMMARY_EVERY_N_TURNS", settings.summary_every_n_turns))
+            
+            # Image prompt enhancement
+            settings.prompt_enhancer_enabled = str(st.secrets.get("FEATURES", {}).get("PROMPT_ENHANCER_ENABLED", settings.prompt_enhancer_enabled)).lower() == "true"
+            settings.prompt_enhancer_model_id = st.secrets.get("AWS",{}).get("AWS_BEDROCK_AI_MODELO_PROMPT", settings.prompt_enhancer_model_id)
+            settings.prompt_enhancer_timeout_seconds = float(st.secrets.get("FEATURES", {}).get("PROMPT_ENHANCER_TIMEOUT_SECONDS", settings.prompt_enhancer_timeout_seconds))
+            settings.prompt_enhancer_cache_size = int(st.secrets.get("CACHE", {}).get("PROMPT_ENHANCER_CACHE_SIZE", settings.prompt_enhancer_cache_size))
+            
+            # Response cache
+            settings.response_cache_enabled = str(st.secrets.get("CACHE", {}).get("RESPONSE_CACHE_ENABLED", settings.response_cache_enabled)).lower() == "true"
+            settings.response_cache_max_entries = int(st.secrets.get("CACHE", {}).get("RESPONSE_CACHE_MAX_ENTRIES", settings.response_cache_max_entries))
+            settings.response_cache_ttl_seconds = int(st.secrets.get("CACHE", {}).get("RESPONSE_CACHE_TTL_SECONDS", settings.response_cache_ttl_seconds))
             
             # TEA
             settings.tea_default_verbosity = st.secrets.get("TEA_DEFAULT_VERBOSITY", "brief")
@@ -1,15 +1,34 @@
 import boto3
+from botocore.config import Config
 import json
 import logging
-from typing import Dict, Any, Optional, List
+import os
+from typing import Dict, Any, Optional, List, Iterator
 from datetime import datetime
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from config.settings import settings
-from config.constants import TEA_SYSTEM_PROMPT
+from config.constants import TEA_SYSTEM_PROMPT, INTENT_KEYWORDS
+from config.intent_corpus import INTENT_CORPUS
 from services.dynamodb import ImageUsageRepository
+from services.bedrock_invoker import BedrockInvoker
+from services.image_cache import ImageCache
+from services.prompt_enhancer import PromptEnhancer
+from services.conversation_store import WriteBehindQueue, create_conversation_store
 from services.ip_utils import get_client_ip
+from langchain_aws import ChatBedrock
 from tools.generate_image import GenerateImageTool
+from tools.image_result import ImageResult
+from tools.ask_general import AskGeneralTool
+from tools.expand_explanation import ExpandExplanationTool
 from core.memory import RAMConversationMemory, SessionMemoryManager
+from core.response_cache import ResponseCache
+from core.summarizer import ConversationSummarizer
+from core.single_flight import SingleFlight
+from core.intent_matcher import IntentMatcher, IntentMatch
+from core.intent_classifier import IntentClassifier, CHAT_INTENT
+from core.tool_registry import ToolRegistry
+from core.image_jobs import ImageJobQueue, ImageQueueFullError, UserImageQueueFullError, JOB_QUEUED
 
 logger = logging.getLogger(__name__)
 
@@ -18,46 +37,155 @@ class TEAOptimizedAgent:
     """
     Agente conversacional con memoria RAM pura.
     NO usa langchain.memory (deprecated).
+    Una sola instancia es compartida por todas las sesiones del proceso:
+    los clientes AWS son thread-safe y la memoria se aísla por session_id.
     """
     
     def __init__(self):
         """Inicializa el agente con memoria RAM y clientes AWS"""
         
-        # Cliente Bedrock para texto
-        self.bedrock_client = boto3.client(
-            'bedrock-runtime',
-            region_name=settings.aws_region,
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_access_key
+        # Cliente Bedrock (texto e imagen) detrás de la capa de reintentos
+        # y circuit breaker; los reintentos propios de botocore se desactivan
+        self.bedrock_client = BedrockInvoker(
+            boto3.client(
+                'bedrock-runtime',
+                region_name=settings.aws_region,
+                aws_access_key_id=settings.aws_access_key_id,
+                aws_secret_access_key=settings.aws_secret_access_key,
+                config=Config(retries={"max_attempts": 1, "mode": "standard"})
+            ),
+            max_attempts=settings.bedrock_max_attempts,
+            base_delay=settings.bedrock_backoff_base_seconds,
+            max_delay=settings.bedrock_backoff_max_seconds,
+            failure_threshold=settings.bedrock_breaker_failure_threshold,
+            reset_timeout=settings.bedrock_breaker_reset_seconds
         )
         
         # Modelos
         self.model_id = settings.bedrock_text_model_id
         self.image_model_id = settings.bedrock_image_model_id
         self.max_images_per_day = settings.max_images_per_day
+        self.prompt_caching = settings.bedrock_prompt_caching
+        self.context_max_input_tokens = settings.context_max_input_tokens
         
         # MEMORIA EN RAM - SIN LANGCHAIN
+        # Persistencia opcional detrás de una cola write-behind
+        conversation_store = create_conversation_store(
+            settings.conversation_store_backend,
+            sqlite_path=settings.conversation_store_sqlite_path,
+            table_name=settings.conversation_store_dynamodb_table,
+            region_name=settings.aws_region,
+            endpoint_url=settings.conversation_store_dynamodb_endpoint or None,
+            ttl_seconds=settings.conversation_store_ttl_seconds,
+            aws_access_key_id=settings.aws_access_key_id or None,
+            aws_secret_access_key=settings.aws_secret_access_key or None
+        )
         self.memory_manager = SessionMemoryManager(
-            max_sessions=100,
-            messages_per_session=20
+            max_sessions=settings.max_sessions,
+            messages_per_session=20,
+            idle_ttl_seconds=settings.session_idle_ttl_seconds,
+            sweep_interval_seconds=settings.session_sweep_interval_seconds,
+            writer=WriteBehindQueue(
+                conversation_store,
+                flush_interval_seconds=settings.conversation_store_flush_seconds
+            ) if conversation_store else None
         )
         
         # Repositorio DynamoDB para límite de imágenes
         self.image_repo = ImageUsageRepository()
         
+        # Caché de respuestas exactas (compartida entre sesiones)
+        self.response_cache = ResponseCache(
+            max_entries=settings.response_cache_max_entries,
+            ttl_seconds=settings.response_cache_ttl_seconds
+        ) if settings.response_cache_enabled else None
+        
+        # Tools construidas una sola vez, comparten el cliente Bedrock del agente
+        self.llm = ChatBedrock(
+            client=self.bedrock_client,
+            model_id=self.model_id,
+            model_kwargs={"temperature": 0.1, "max_tokens": 800}
+        )
+        self.tools = ToolRegistry()
+        self.image_cache = ImageCache(
+            cache_dir=settings.image_cache_dir,
+            max_bytes=settings.image_cache_max_mb * 1024 * 1024
+        ) if settings.image_cache_enabled else None
+        self.prompt_enhancer = PromptEnhancer(
+            bedrock_client=self.bedrock_client,
+            model_id=settings.prompt_enhancer_model_id or settings.bedrock_summary_model_id or self.model_id,
+            timeout_seconds=settings.prompt_enhancer_timeout_seconds,
+            max_entries=settings.prompt_enhancer_cache_size,
+            # Junto a la caché de imágenes: su clave depende del prompt mejorado
+            persist_path=os.path.join(settings.image_cache_dir, "prompt_enhancements.jsonl")
+            if settings.image_cache_enabled else None
+        ) if settings.prompt_enhancer_enabled else None
+        self.tools.register(GenerateImageTool(
+            bedrock_client=self.bedrock_client,
+            image_model_id=self.image_model_id,
+            image_repo=self.image_repo,
+            max_images_per_day=self.max_images_per_day,
+            image_cache=self.image_cache,
+            cache_seed_buckets=settings.image_cache_seed_buckets,
+            cache_charge_quota_on_hit=settings.image_cache_charge_quota_on_hit,
+            prompt_enhancer=self.prompt_enhancer
+        ))
+        self.tools.register(AskGeneralTool(llm=self.llm))
+        # Instancia compartida: la memoria de la sesión llega en cada llamada
+        self.tools.register(ExpandExplanationTool(llm=self.llm, context_exchanges=3))
+        
+        # Cola de imágenes: Titan corre fuera del hilo de Streamlit
+        self.image_jobs = ImageJobQueue(
+            run_fn=self._execute_image_tool,
+            max_workers=settings.image_job_workers,
+            max_pending=settings.image_job_max_pending,
+            max_pending_per_user=settings.image_job_max_pending_per_user,
+            retention_seconds=settings.image_job_retention_seconds
+        )
+        
+        # Tools de texto que corren en paralelo al stream de la respuesta
+        self._tool_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-tool")
+        
+        # Despacho de intención -> handler
+        self._intent_handlers = {
+            "generate_image": self._handle_image_intent,
+            "expand_explanation": self._handle_expansion_intent,
+            "ask_general": self._handle_general_intent
+        }
+        
+        # Detector de intención compilado una sola vez
+        self.intent_matcher = IntentMatcher(INTENT_KEYWORDS)
+        
+        # Clasificador local: evita generaciones de imagen accidentales
+        self.intent_classifier = IntentClassifier().fit(INTENT_CORPUS) if settings.intent_classifier_enabled else None
+        self.intent_confidence_threshold = settings.intent_confidence_threshold
+        
+        # Coalescencia de solicitudes idénticas en vuelo
+        self.single_flight = SingleFlight()
+        
+        # Resumen incremental de turnos fuera de la ventana de contexto
+        self.summarizer = ConversationSummarizer(
+            bedrock_client=self.bedrock_client,
+            model_id=settings.bedrock_summary_model_id or self.model_id,
+            every_n_turns=settings.summary_every_n_turns
+        ) if settings.summary_enabled else None
+        
         logger.info(f"TEAOptimizedAgent initialized with model: {self.model_id}")
     
     def _get_session_memory(self, session_id: str) -> RAMConversationMemory:
         """Obtiene memoria para una sesión específica"""
         return self.memory_manager.get_or_create_memory(session_id)
     
-    def process_message(self, session_id: str, message: str) -> Dict[str, Any]:
+    def process_message(self, session_id: str, message: str, use_cache: bool = True, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Procesa mensaje de usuario.
         
         Args:
-            session_id: Identificador único de sesión (IP del usuario)
+            session_id: Identificador único de la sesión del navegador
             message: Mensaje del usuario
+            use_cache: False para ignorar la caché de respuestas
+            user_id: Identificador para el límite diario de imágenes (IP del usuario);
+                si no se indica se usa session_id
         
         Returns:
             Dict con respuesta y metadatos
@@ -70,7 +198,7 @@ class TEAOptimizedAgent:
             memory.add_user_message(message)
             
             # 3. Detectar intención y ejecutar herramientas
-            tool_result = self._detect_and_execute_tool(message, session_id, memory)
+            tool_result = self._detect_and_execute_tool(message, user_id or session_id, memory)
             
             # 4. Si es imagen, retornar directamente
             if tool_result and tool_result.get("tool") == "generate_image":
@@ -78,21 +206,27 @@ class TEAOptimizedAgent:
                 
                 # Guardar respuesta en memoria
                 if response_data.get("success"):
-                    memory.add_ai_message(f"Imagen generada: {response_data.get('message', '')}")
+                    memory.add_ai_message(f"Imagen solicitada: {response_data.get('prompt', '')}")
                 else:
                     memory.add_ai_message(f"Error: {response_data.get('message', 'No se pudo generar la imagen')}")
+                self._schedule_summary(memory)
                 
                 return {
-                    "response": json.dumps(response_data),
+                    "response": response_data.get("message", ""),
                     "tool_used": "generate_image",
+                    "image_job_id": response_data.get("job_id"),
                     "memory_stats": memory.get_conversation_summary()
                 }
             
-            # 5. Generar respuesta con LLM
-            response = self._generate_response(message, memory)
+            # 5. Preguntas USIL/SIU: responde la tool, sin pasar por el LLM general
+            if tool_result and tool_result.get("tool") == "ask_general":
+                response = tool_result["result"]
+            else:
+                response = self._generate_response(message, memory, use_cache=use_cache)
             
             # 6. Guardar respuesta en memoria
             memory.add_ai_message(response)
+            self._schedule_summary(memory)
             
             # 7. Si hay tool result de expansión, agregarlo
             if tool_result and tool_result.get("tool") == "expand_explanation":
@@ -112,48 +246,200 @@ class TEAOptimizedAgent:
                 "tool_used": None
             }
     
-    def _generate_response(self, message: str, memory: RAMConversationMemory) -> str:
-        """Genera respuesta usando Bedrock Claude"""
+    def process_message_stream(self, session_id: str, message: str, use_cache: bool = True, user_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Variante en streaming de process_message.
+        
+        Args:
+            session_id: Identificador único de la sesión del navegador
+            message: Mensaje del usuario
+            use_cache: False para ignorar la caché de respuestas
+            user_id: Identificador para el límite diario de imágenes (IP del usuario)
+        
+        Yields:
+            {"type": "chunk", "text": ...} por cada fragmento recibido de Bedrock
+            y un evento final {"type": "done", ...} con los mismos campos que
+            process_message. La memoria se escribe solo al terminar el stream.
+        """
         try:
-            # Obtener contexto de la conversación
-            context = memory.get_context_string(n=5)
+            # 1. Obtener memoria de la sesión
+            memory = self._get_session_memory(session_id)
             
-            # Construir prompt completo
-            prompt = f"""{TEA_SYSTEM_PROMPT}
-
-            CONVERSACIÓN PREVIA:
-            {context}
-
-            USUARIO: {message}
-
-            ASISTENTE (respuesta literal, clara, sin metáforas):"""
-                        
-            # Payload para Claude 3.5 Sonnet
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1024,
-                "temperature": 0.1,
-                "top_p": 0.9,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+            # 2. Guardar mensaje del usuario
+            memory.add_user_message(message)
+            
+            # 3. Detectar intención y ejecutar herramientas.
+            # La expansión (otra llamada al LLM) corre en paralelo al stream:
+            # no retrasa el primer token y se agrega al evento final
+            match = self._detect_tool_intent(message)
+            expansion = None
+            if match and match.intent == "expand_explanation":
+                expansion = self._tool_executor.submit(
+                    self._handle_expansion_intent, message, match, user_id or session_id, memory
+                )
+                tool_result = None
+            else:
+                tool_result = self._execute_tool(match, message, user_id or session_id, memory)
+            
+            # 4. Las imágenes no se transmiten por partes
+            if tool_result and tool_result.get("tool") == "generate_image":
+                response_data = tool_result["result"]
+                
+                if response_data.get("success"):
+                    memory.add_ai_message(f"Imagen solicitada: {response_data.get('prompt', '')}")
+                else:
+                    memory.add_ai_message(f"Error: {response_data.get('message', 'No se pudo generar la imagen')}")
+                self._schedule_summary(memory)
+                
+                yield {
+                    "type": "done",
+                    "response": response_data.get("message", ""),
+                    "tool_used": "generate_image",
+                    "image_job_id": response_data.get("job_id"),
+                    "memory_stats": memory.get_conversation_summary()
+                }
+                return
+            
+            # 5. Transmitir respuesta del LLM a medida que llega
+            # (las preguntas USIL/SIU ya vienen respondidas por la tool)
+            if tool_result and tool_result.get("tool") == "ask_general":
+                response = tool_result["result"]
+                yield {"type": "chunk", "text": response}
+            else:
+                chunks = []
+                for text in self._generate_response_stream(message, memory, use_cache=use_cache):
+                    chunks.append(text)
+                    yield {"type": "chunk", "text": text}
+                response = self._apply_tea_formatting("".join(chunks))
+            
+            # La expansión lee la memoria: se espera antes de escribir la respuesta
+            if expansion is not None:
+                tool_result = {"tool": "expand_explanation", "result": expansion.result()}
+            
+            # 6. Guardar respuesta completa en memoria
+            memory.add_ai_message(response)
+            self._schedule_summary(memory)
+            
+            # 7. Si hay tool result de expansión, agregarlo
+            if tool_result and tool_result.get("tool") == "expand_explanation":
+                response += f"\n\n{tool_result['result']}"
+            
+            yield {
+                "type": "done",
+                "response": response,
+                "tool_used": tool_result.get("tool") if tool_result else None,
+                "memory_stats": memory.get_conversation_summary()
             }
             
+        except Exception as e:
+            logger.error(f"Error streaming message for session {session_id}: {e}", exc_info=True)
+            yield {
+                "type": "done",
+                "response": "Lo siento, ocurrió un error. Por favor intenta de nuevo.",
+                "error": str(e),
+                "tool_used": None
+            }
+    
+    def _schedule_summary(self, memory: RAMConversationMemory) -> None:
+        """Refresca en segundo plano el resumen de los turnos antiguos"""
+        if self.summarizer:
+            self.summarizer.maybe_schedule(memory)
+    
+    def _build_request_body(self, turns: List[Dict[str, str]], summary: str = "") -> Dict[str, Any]:
+        """
+        Construye el payload de Claude a partir de los turnos de la conversación.
+        El TEA_SYSTEM_PROMPT va en el campo system como bloque cacheable,
+        así Bedrock reutiliza el prefijo en lugar de procesarlo en cada turno.
+        El resumen de turnos antiguos va después, fuera del prefijo cacheado.
+        """
+        system_block = {"type": "text", "text": TEA_SYSTEM_PROMPT}
+        if self.prompt_caching:
+            system_block["cache_control"] = {"type": "ephemeral"}
+        
+        system = [system_block]
+        if summary:
+            system.append({
+                "type": "text",
+                "text": f"RESUMEN DE LA CONVERSACIÓN ANTERIOR:\n{summary}"
+            })
+        
+        # Payload para Claude 3.5 Sonnet
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 1024,
+            "temperature": 0.1,
+            "top_p": 0.9,
+            "system": system,
+            "messages": turns
+        }
+    
+    def _log_cache_usage(self, usage: Dict[str, Any]) -> None:
+        """Registra hit/miss del prompt cache y tokens de entrada cacheados"""
+        if not usage:
+            return
+        
+        cache_read = usage.get("cache_read_input_tokens", 0) or 0
+        cache_write = usage.get("cache_creation_input_tokens", 0) or 0
+        input_tokens = usage.get("input_tokens", 0) or 0
+        
+        logger.info(
+            f"Prompt cache {'hit' if cache_read else 'miss'} - model: {self.model_id}, "
+            f"cached_input_tokens: {cache_read}, cache_write_tokens: {cache_write}, "
+            f"uncached_input_tokens: {input_tokens}"
+        )
+    
+    def _get_request_key(self, message: str, turns: List[Dict[str, str]], summary: str) -> str:
+        """Clave de la solicitud: mensaje normalizado + hash del contexto + modelo"""
+        context = json.dumps([summary, turns], ensure_ascii=False)
+        return ResponseCache.make_key(message, context, self.model_id)
+    
+    def _get_cached_response(self, request_key: str, use_cache: bool) -> Optional[str]:
+        if not use_cache or self.response_cache is None:
+            return None
+        return self.response_cache.get(request_key)
+    
+    def _store_cached_response(self, request_key: str, text: str, use_cache: bool) -> None:
+        if use_cache and self.response_cache is not None and text:
+            self.response_cache.set(request_key, text)
+    
+    def _invoke_text_model(self, body: Dict[str, Any]) -> str:
+        """Invocación bloqueante a Bedrock; retorna el texto sin post-procesar"""
+        logger.debug(f"Invoking Bedrock model: {self.model_id}")
+        
+        response = self.bedrock_client.invoke_model(
+            modelId=self.model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body)
+        )
+        
+        response_body = json.loads(response['body'].read())
+        self._log_cache_usage(response_body.get('usage', {}))
+        return response_body['content'][0]['text']
+    
+    def _generate_response(self, message: str, memory: RAMConversationMemory, use_cache: bool = True) -> str:
+        """Genera respuesta usando Bedrock Claude"""
+        try:
+            # Turnos de la conversación (el mensaje actual ya está en memoria)
+            turns = memory.get_message_turns(max_tokens=self.context_max_input_tokens)
+            
+            summary = memory.summary
+            request_key = self._get_request_key(message, turns, summary)
+            cached = self._get_cached_response(request_key, use_cache)
+            if cached is not None:
+                logger.info("Response cache hit")
+                return self._apply_tea_formatting(cached)
             
-            logger.debug(f"Invoking Bedrock model: {self.model_id}")
+            body = self._build_request_body(turns, summary)
             
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body)
+            # Solicitudes idénticas en vuelo comparten una sola invocación
+            generated_text, shared = self.single_flight.do(
+                request_key, lambda: self._invoke_text_model(body)
             )
+            if shared:
+                logger.info("Coalesced identical in-flight request")
             
-            response_body = json.loads(response['body'].read())
-            generated_text = response_body['content'][0]['text']
+            self._store_cached_response(request_key, generated_text, use_cache)
                 
             # Post-procesamiento TEA
             generated_text = self._apply_tea_formatting(generated_text)
@@ -166,6 +452,71 @@ class TEAOptimizedAgent:
             logger.error(f"Bedrock generation failed: {e}")
             return f"Lo siento, no pude generar una respuesta en este momento, Error:  {str(e)}; line_number: {line_number }, {self.model_id}, {self.bedrock_client}"
     
+    def _generate_response_stream(self, message: str, memory: RAMConversationMemory, use_cache: bool = True) -> Iterator[str]:
+        """Genera respuesta en streaming usando invoke_model_with_response_stream"""
+        try:
+            # Turnos de la conversación (el mensaje actual ya está en memoria)
+            turns = memory.get_message_turns(max_tokens=self.context_max_input_tokens)
+            
+            summary = memory.summary
+            request_key = self._get_request_key(message, turns, summary)
+            cached = self._get_cached_response(request_key, use_cache)
+            if cached is not None:
+                logger.info("Response cache hit (stream)")
+                yield cached
+                return
+            
+            # Si la misma solicitud ya está en vuelo, se espera su resultado
+            call, is_leader = self.single_flight.begin(request_key)
+            if not is_leader:
+                logger.info("Coalesced identical in-flight request (stream)")
+                yield call.wait(self.single_flight.wait_timeout)
+                return
+            
+            try:
+                body = self._build_request_body(turns, summary)
+                
+                logger.debug(f"Invoking Bedrock model (stream): {self.model_id}")
+                
+                response = self.bedrock_client.invoke_model_with_response_stream(
+                    modelId=self.model_id,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=json.dumps(body)
+                )
+                
+                chunks = []
+                for event in response['body']:
+                    chunk = event.get('chunk')
+                    if not chunk:
+                        continue
+                    
+                    payload = json.loads(chunk['bytes'])
+                    if payload.get('type') == 'message_start':
+                        self._log_cache_usage(payload.get('message', {}).get('usage', {}))
+                    elif payload.get('type') == 'content_block_delta':
+                        text = payload.get('delta', {}).get('text', '')
+                        if text:
+                            chunks.append(text)
+                            yield text
+                
+                generated_text = "".join(chunks)
+                self.single_flight.finish(request_key, call, result=generated_text)
+                
+                # Solo se cachean streams completos
+                self._store_cached_response(request_key, generated_text, use_cache)
+                
+            except BaseException as e:
+                # Incluye GeneratorExit (stream abandonado): liberar a los seguidores
+                error = e if isinstance(e, Exception) else RuntimeError("Stream abandoned")
+                self.single_flight.finish(request_key, call, error=error)
+                raise
+            
+        except Exception as e:
+            exc_type, exc_obj, tb = sys.exc_info()
+            line_number = tb.tb_lineno
+            logger.error(f"Bedrock stream failed: {e}")
+            yield f"Lo siento, no pude generar una respuesta en este momento, Error:  {str(e)}; line_number: {line_number }, {self.model_id}"
     
     def _generate_response_deepseek(self, message: str, memory: RAMConversationMemory) -> str:
         """Genera respuesta usando Bedrock Claude"""
@@ -213,121 +564,91 @@ class TEAOptimizedAgent:
             logger.error(f"Bedrock generation failed: {e}")
             return f"Lo siento, no pude generar una respuesta en este momento, Error:  {str(e)}; line_number: {line_number }, {self.model_id}, {self.bedrock_client}"
     
-    def _detect_and_execute_tool(self, message: str, session_id: str, memory: RAMConversationMemory) -> Optional[Dict[str, Any]]:
+    def _detect_and_execute_tool(self, message: str, user_id: str, memory: RAMConversationMemory) -> Optional[Dict[str, Any]]:
         """Detecta intención y ejecuta herramientas"""
-        message_lower = message.lower()
-        
-        # === DETECCIÓN DE IMAGEN ===
-        image_keywords = [
-            'genera', 'dibuja', 'crea una imagen', 'imagen de', 'imagen sobre',
-            'generate', 'draw', 'create an image', 'picture of', 'imagen',
-            'dibujar', 'crear imagen', 'haz una imagen', 'quiero una imagen'
-        ]
-        
-        if any(keyword in message_lower for keyword in image_keywords):
-            # Extraer prompt
-            prompt = message
-            for kw in image_keywords:
-                prompt = prompt.replace(kw, "").replace(kw.capitalize(), "")
-            
-            # Limpiar prompt
-            prompt = prompt.strip().strip('.,:;!¿?')
-            
-            if not prompt or len(prompt) < 3:
-                prompt = "universidad moderna con estudiantes y tecnología"
-            
-            logger.info(f"Image generation requested. Prompt: {prompt[:50]}...")
-            
-            # Ejecutar tool
-            result = self._execute_image_tool(prompt, session_id)
-            return {"tool": "generate_image", "result": result}
-        
-        # === DETECCIÓN DE EXPANSIÓN ===
-        expand_keywords = [
-            'más detalles', 'explica paso a paso', 'expandir', 'más información',
-            'more details', 'step by step', 'explain more', 'detalles',
-            'explicación detallada', 'ampliar', 'desarrolla'
-        ]
-        
-        if any(keyword in message_lower for keyword in expand_keywords):
-            logger.info("Expansion explanation requested")
-            expansion = self._generate_expansion(message, memory)
-            return {"tool": "expand_explanation", "result": expansion}
-        
-        return None
+        return self._execute_tool(self._detect_tool_intent(message), message, user_id, memory)
     
-    def _execute_image_tool(self, prompt: str, session_id: str) -> Dict[str, Any]:
-        """Ejecuta generación de imagen con control de límite"""
+    def _detect_tool_intent(self, message: str) -> Optional[IntentMatch]:
+        """Intención de tool confirmada (palabras clave + veto del clasificador), sin ejecutarla"""
+        match = self.intent_matcher.match(message)
+        if not match:
+            return None
+        intent = match.intent
+        
+        # El clasificador solo veta: sin palabra clave nunca se dispara una tool,
+        # y la coincidencia se descarta si el modelo la reconoce como charla con confianza.
+        # Las intenciones fuera de su corpus (ask_general) dependen solo de las palabras clave
+        if self.intent_classifier is not None and intent in self.intent_classifier.labels:
+            predicted, confidence = self.intent_classifier.predict(message)
+            logger.info(f"Intent classified: {predicted} (confidence: {confidence:.2f}, keywords: {intent})")
+            if predicted == CHAT_INTENT and confidence >= self.intent_confidence_threshold:
+                return None
+        
+        return match
+    
+    def _execute_tool(self, match: Optional[IntentMatch], message: str, user_id: str, memory: RAMConversationMemory) -> Optional[Dict[str, Any]]:
+        """Ejecuta el handler de la intención detectada"""
+        handler = self._intent_handlers.get(match.intent) if match else None
+        if not handler:
+            return None
+        
+        return {"tool": match.intent, "result": handler(message, match, user_id, memory)}
+    
+    def _handle_image_intent(self, message: str, match: Optional[IntentMatch], user_id: str, memory: RAMConversationMemory) -> Dict[str, Any]:
+        """Extrae el prompt y genera la imagen"""
+        prompt = match.prompt if match and match.intent == "generate_image" else message.strip(" .,:;!¡¿?")
+        
+        if not prompt or len(prompt) < 3:
+            prompt = "universidad moderna con estudiantes y tecnología"
+        
+        logger.info(f"Image generation requested. Prompt: {prompt[:50]}...")
+        
+        # Se retorna el handle del trabajo sin esperar a Titan
         try:
-            tool = GenerateImageTool(
-                bedrock_client=self.bedrock_client,
-                image_model_id=self.image_model_id,
-                image_repo=self.image_repo,
-                max_images_per_day=self.max_images_per_day
-            )
-            
-            result = tool._run(prompt, session_id)
-            
-            if isinstance(result, str):
-                try:
-                    return json.loads(result)
-                except:
-                    return {
-                        "success": False,
-                        "message": result,
-                        "error": "Invalid response format"
-                    }
-            return result
-            
-        except Exception as e:
-            logger.error(f"Image tool error: {e}")
+            job = self.image_jobs.submit(user_id, prompt)
+        except UserImageQueueFullError as e:
+            logger.warning(f"Image job rejected: {e}")
             return {
                 "success": False,
-                "message": f"Error al generar imagen: {str(e)}",
-                "error": str(e)
+                "message": "Your previous images are still being generated. Please wait for them to finish."
             }
+        except ImageQueueFullError as e:
+            logger.warning(f"Image job rejected: {e}")
+            return {
+                "success": False,
+                "message": "Too many images are being generated right now. Please try again in a minute."
+            }
+        
+        return {
+            "success": True,
+            "job_id": job.job_id,
+            "state": JOB_QUEUED,
+            "prompt": prompt,
+            "message": "🎨 Generating image..."
+        }
     
-    def _generate_expansion(self, message: str, memory: RAMConversationMemory) -> str:
-        """Genera explicación paso a paso"""
+    def _handle_expansion_intent(self, message: str, match: Optional[IntentMatch], user_id: str, memory: RAMConversationMemory) -> str:
+        """Genera la explicación paso a paso"""
+        logger.info("Expansion explanation requested")
+        return self.tools.run("expand_explanation", message, memory=memory)
+    
+    def _handle_general_intent(self, message: str, match: Optional[IntentMatch], user_id: str, memory: RAMConversationMemory) -> str:
+        """Responde preguntas sobre USIL/SIU con la tool factual"""
+        logger.info("General USIL/SIU question detected")
+        return self.tools.run("ask_general", message)
+    
+    def _execute_image_tool(self, prompt: str, user_id: str) -> ImageResult:
+        """Ejecuta generación de imagen con control de límite"""
         try:
-            # Obtener contexto reciente
-            context = memory.get_context_string(n=3)
-            
-            prompt = f"""Basado en esta conversación:
-{context}
-
-El usuario pide más detalles.
-
-Genera una explicación PASO A PASO con:
-1. Formato numérico (1., 2., 3.)
-2. Máximo 6 pasos
-3. Lenguaje claro y literal
-4. Cada paso una acción o concepto específico
-
-EXPLICACIÓN PASO A PASO:"""
-            
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 800,
-                "temperature": 0.1,
-                "messages": [{"role": "user", "content": prompt}]
-            }
+            result = self.tools.run("generate_image", prompt, user_id)
             
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body)
-            )
-            
-            response_body = json.loads(response['body'].read())
-            expansion = response_body['content'][0]['text']
-            
-            return expansion
+            if not isinstance(result, ImageResult):
+                return ImageResult.failure(str(result), error="Invalid response format")
+            return result
             
         except Exception as e:
-            logger.error(f"Expansion generation error: {e}")
-            return "No pude generar una explicación paso a paso. Por favor intenta de nuevo."
+            logger.error(f"Image tool error: {e}")
+            return ImageResult.failure(f"Error al generar imagen: {str(e)}", error=str(e))
     
     def _apply_tea_formatting(self, text: str) -> str:
         """Aplica formato amigable para TEA"""
@@ -370,10 +691,19 @@ EXPLICACIÓN PASO A PASO:"""
         
         return text
     
+    def get_image_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de un trabajo de imagen (None si no existe o expiró)"""
+        return self.image_jobs.get(job_id)
+    
     def clear_session(self, session_id: str) -> bool:
         """Limpia la memoria de una sesión"""
         return self.memory_manager.delete_memory(session_id)
     
+    def get_session_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """Mensajes de la sesión como dicts role/content"""
+        messages = self.memory_manager.peek_messages(session_id)
+        return [{"role": m.role.value, "content": m.content} for m in messages]
+    
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """Obtiene estadísticas de una sesión"""
         memory = self.memory_manager.get_memory(session_id)
@@ -383,4 +713,25 @@ EXPLICACIÓN PASO A PASO:"""
     
     def get_global_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas globales del agente"""
-        return self.memory_manager.get_stats()
\ No newline at end of file
+        stats = self.memory_manager.get_stats()
+        stats["bedrock"] = self.bedrock_client.get_stats()
+        stats["single_flight"] = self.single_flight.get_stats()
+        stats["image_jobs"] = self.image_jobs.get_stats()
+        if self.image_cache is not None:
+            stats["image_cache"] = self.image_cache.get_stats()
+        if self.prompt_enhancer is not None:
+            stats["prompt_enhancer"] = self.prompt_enhancer.get_stats()
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.get_stats()
+        return stats
+    
+    def shutdown(self) -> None:
+        """Detiene hilos en segundo plano y libera las sesiones"""
+        self.memory_manager.shutdown()
+        self.image_jobs.shutdown()
+        if self.summarizer:
+            self.summarizer.shutdown()
+        if self.prompt_enhancer:
+            self.prompt_enhancer.shutdown()
+        self._tool_executor.shutdown(wait=False)
+        logger.info("TEAOptimizedAgent shut down")
\ No newline at end of file
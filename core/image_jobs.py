@@ -0,0 +1,172 @@
+"""
+Cola de trabajos de generación de imágenes.
+Las llamadas a Titan corren en un pool acotado de hilos; la interfaz recibe
+un job_id al instante y consulta el estado hasta que la imagen está lista.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class ImageQueueFullError(Exception):
+    """Hay demasiados trabajos pendientes"""
+
+
+class UserImageQueueFullError(ImageQueueFullError):
+    """El usuario ya tiene el máximo de trabajos pendientes"""
+
+
+class ImageJob:
+    """Estado de un trabajo de imagen"""
+
+    def __init__(self, user_id: str, prompt: str):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.prompt = prompt
+        self.state = JOB_QUEUED
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "prompt": self.prompt,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class ImageJobQueue:
+    """
+    Pool acotado de workers para imágenes.
+    max_pending limita la cola global y max_pending_per_user la de cada usuario,
+    para que un solo cliente no ocupe todos los cupos.
+    Los resultados terminados se conservan retention_seconds para que la UI los recoja.
+    """
+
+    def __init__(self, run_fn: Callable[[str, str], Any], max_workers: int = 2,
+                 max_pending: int = 20, max_pending_per_user: int = 2,
+                 retention_seconds: float = 600):
+        self.run_fn = run_fn
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-job")
+        self._jobs: Dict[str, ImageJob] = {}
+        # Trabajos terminados en orden de finalización: la purga solo mira el frente
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._state_counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+        self._pending_by_user: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, user_id: str, prompt: str) -> ImageJob:
+        """Encola un trabajo y retorna su handle sin esperar la generación"""
+        with self._lock:
+            self._purge_expired()
+            pending = self._state_counts[JOB_QUEUED] + self._state_counts[JOB_RUNNING]
+            if pending >= self.max_pending:
+                self.rejected += 1
+                raise ImageQueueFullError(f"Image queue full ({pending} pending)")
+
+            user_pending = self._pending_by_user.get(user_id, 0)
+            if user_pending >= self.max_pending_per_user:
+                self.rejected += 1
+                raise UserImageQueueFullError(f"User {user_id} has {user_pending} image jobs pending")
+
+            job = ImageJob(user_id, prompt)
+            self._jobs[job.job_id] = job
+            self._pending_by_user[user_id] = user_pending + 1
+            self._state_counts[JOB_QUEUED] += 1
+            self.submitted += 1
+
+        self._executor.submit(self._run, job)
+        logger.info(f"Image job queued: {job.job_id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def _set_state(self, job: ImageJob, state: str) -> None:
+        """Cambia el estado y mantiene los contadores (requiere el lock)"""
+        self._state_counts[job.state] -= 1
+        self._state_counts[state] += 1
+        job.state = state
+
+    def _run(self, job: ImageJob) -> None:
+        with self._lock:
+            self._set_state(job, JOB_RUNNING)
+
+        try:
+            result = self.run_fn(job.prompt, job.user_id)
+            with self._lock:
+                job.result = result
+                self._set_state(job, JOB_DONE)
+                self.completed += 1
+
+        except Exception as e:
+            logger.error(f"Image job {job.job_id} failed: {e}")
+            with self._lock:
+                job.error = str(e)
+                self._set_state(job, JOB_FAILED)
+                self.failed += 1
+
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                self._finished[job.job_id] = job.finished_at
+                remaining = self._pending_by_user[job.user_id] - 1
+                if remaining:
+                    self._pending_by_user[job.user_id] = remaining
+                else:
+                    del self._pending_by_user[job.user_id]
+
+    def _purge_expired(self) -> None:
+        """Elimina resultados ya retenidos el tiempo máximo (requiere el lock)"""
+        cutoff = time.time() - self.retention_seconds
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= cutoff:
+                break
+            del self._finished[job_id]
+            job = self._jobs.pop(job_id)
+            self._state_counts[job.state] -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._purge_expired()
+            return {
+                "queued": self._state_counts[JOB_QUEUED],
+                "running": self._state_counts[JOB_RUNNING],
+                "retained": self._state_counts[JOB_DONE] + self._state_counts[JOB_FAILED],
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,89 @@
+"""
+Clasificador local de intención.
+Naive Bayes multinomial sobre n-gramas de caracteres, entrenado al arrancar
+con el corpus etiquetado de config/intent_corpus.py. Sin llamadas a Bedrock.
+"""
+
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from core.response_cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+CHAT_INTENT = "chat"
+
+
+class IntentClassifier:
+    """
+    Retorna (intención, confianza) para un mensaje.
+    La confianza es la probabilidad posterior de la clase ganadora.
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (2, 4), alpha: float = 0.5,
+                 temperature: float = 2.0):
+        self.ngram_range = ngram_range
+        self.alpha = alpha
+        # Suaviza la sobreconfianza de Naive Bayes con muchos n-gramas correlacionados
+        self.temperature = temperature
+
+        self.labels: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.class_log_prior = np.zeros(0)
+        self.feature_log_prob = np.zeros((0, 0))
+
+    def _ngrams(self, text: str) -> List[str]:
+        padded = f" {normalize_message(text)} "
+        low, high = self.ngram_range
+        return [
+            padded[i:i + n]
+            for n in range(low, high + 1)
+            for i in range(len(padded) - n + 1)
+        ]
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        indices = [self.vocabulary[g] for g in self._ngrams(text) if g in self.vocabulary]
+        return np.bincount(np.asarray(indices, dtype=np.int64), minlength=len(self.vocabulary))
+
+    def fit(self, samples: Sequence[Tuple[str, str]]) -> "IntentClassifier":
+        self.labels = sorted({label for _, label in samples})
+        label_index = {label: i for i, label in enumerate(self.labels)}
+
+        self.vocabulary = {}
+        for text, _ in samples:
+            for gram in self._ngrams(text):
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+
+        counts = np.zeros((len(self.labels), len(self.vocabulary)), dtype=np.float64)
+        class_counts = np.zeros(len(self.labels), dtype=np.float64)
+        for text, label in samples:
+            counts[label_index[label]] += self._vectorize(text)
+            class_counts[label_index[label]] += 1
+
+        smoothed = counts + self.alpha
+        self.feature_log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        self.class_log_prior = np.log(class_counts / class_counts.sum())
+
+        logger.info(
+            f"IntentClassifier trained - samples: {len(samples)}, "
+            f"labels: {self.labels}, vocabulary: {len(self.vocabulary)}"
+        )
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        features = self._vectorize(text)
+        n_features = max(int(features.sum()), 1)
+
+        log_likelihood = self.feature_log_prob @ features
+        scores = self.class_log_prior + log_likelihood * (self.temperature / n_features)
+        scores -= scores.max()
+        probs = np.exp(scores)
+        probs /= probs.sum()
+        return dict(zip(self.labels, probs.tolist()))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probs = self.predict_proba(text)
+        intent = max(probs, key=probs.get)
+        return intent, probs[intent]
@@ -0,0 +1,63 @@
+"""
+Detección de intención por palabras clave.
+Una sola expresión regular precompilada, con límites de palabra,
+detecta la intención y extrae el prompt en una sola pasada.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+_PROMPT_STRIP_CHARS = " \t\n.,:;!¡¿?"
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    prompt: str
+
+
+class IntentMatcher:
+    """
+    Matcher multi-patrón construido a partir de tablas de palabras clave.
+    "imagen" coincide con "una imagen de", pero no dentro de "imaginación".
+    """
+
+    def __init__(self, keyword_tables: Dict[str, List[str]]):
+        # El orden de las tablas define la prioridad entre intenciones
+        self.intents = list(keyword_tables.keys())
+        self._group_to_intent: Dict[str, str] = {}
+
+        alternatives = []
+        for index, (intent, keywords) in enumerate(keyword_tables.items()):
+            group = f"i{index}"
+            self._group_to_intent[group] = intent
+            # Las frases más largas primero: "imagen de" gana sobre "imagen"
+            ordered = sorted(set(kw.lower() for kw in keywords), key=len, reverse=True)
+            body = "|".join(re.escape(kw).replace(r"\ ", r"\s+") for kw in ordered)
+            alternatives.append(f"(?P<{group}>{body})")
+
+        self._pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(alternatives) + r")(?!\w)",
+            re.IGNORECASE
+        )
+
+    def match(self, message: str) -> Optional[IntentMatch]:
+        """Retorna la intención de mayor prioridad y el mensaje sin sus palabras clave"""
+        spans: Dict[str, List[tuple]] = {}
+        for m in self._pattern.finditer(message):
+            spans.setdefault(self._group_to_intent[m.lastgroup], []).append(m.span())
+
+        if not spans:
+            return None
+
+        intent = next(name for name in self.intents if name in spans)
+
+        pieces = []
+        cursor = 0
+        for start, end in spans[intent]:
+            pieces.append(message[cursor:start])
+            cursor = end
+        pieces.append(message[cursor:])
+
+        prompt = _WHITESPACE_RE.sub(" ", " ".join(pieces)).strip(_PROMPT_STRIP_CHARS)
+        return IntentMatch(intent, prompt)
@@ -3,9 +3,95 @@ Memoria conversacional en RAM pura.
 100% Python estándar, sin dependencias de LangChain.
 """
 
-from collections import deque
-from typing import List, Dict, Any, Optional
+import logging
+import math
+import sys
+import threading
+import time
+from collections import deque, OrderedDict
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 from datetime import datetime
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+# Aproximación de tokens para español/inglés (sin tokenizer externo)
+CHARS_PER_TOKEN = 3.5
+TOKENS_PER_MESSAGE = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación barata de tokens de un mensaje, incluida la sobrecarga de rol"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) + TOKENS_PER_MESSAGE
+
+
+class Role(str, Enum):
+    """Rol de un mensaje; los miembros son instancias únicas compartidas"""
+    USER = "user"
+    ASSISTANT = "assistant"
+
+
+class ChatMessage:
+    """
+    Registro compacto de un mensaje.
+    __slots__ evita el dict por instancia; el rol es un miembro del enum y
+    el timestamp un float epoch en lugar de un string ISO-8601.
+    """
+    
+    __slots__ = ("role", "content", "tokens", "seq", "timestamp")
+    
+    def __init__(self, role: Role, content: str, tokens: int, seq: int, timestamp: float):
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+        self.seq = seq
+        self.timestamp = timestamp
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "role": self.role.value,
+            "content": self.content,
+            "tokens": self.tokens,
+            "seq": self.seq,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+    
+    def __repr__(self) -> str:
+        return f"ChatMessage(role={self.role.value!r}, seq={self.seq}, content={self.content[:30]!r})"
+
+
+def format_messages(messages) -> str:
+    """Renderiza mensajes como líneas 'Usuario:' / 'Asistente:'"""
+    return "\n".join(
+        f"{'Usuario:' if msg.role is Role.USER else 'Asistente:'} {msg.content}"
+        for msg in messages
+    )
+
+
+class ConversationWindowView:
+    """
+    Vista de solo lectura de los últimos N intercambios de una memoria.
+    Se toma solo la cola del deque (a lo sumo 2N referencias), sin copiar
+    la lista completa; los mensajes no se duplican.
+    """
+    
+    __slots__ = ("_messages",)
+    
+    def __init__(self, memory: "RAMConversationMemory", n_exchanges: int):
+        self._messages: Tuple[ChatMessage, ...] = tuple(memory._tail(n_exchanges * 2))
+    
+    def __iter__(self) -> Iterator[ChatMessage]:
+        return iter(self._messages)
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    def __getitem__(self, index):
+        return self._messages[index]
+    
+    def format(self) -> str:
+        return format_messages(self._messages)
 
 
 class RAMConversationMemory:
@@ -19,54 +105,266 @@ class RAMConversationMemory:
         self.max_messages = max_messages * 2
         self.messages = deque(maxlen=self.max_messages)
         self.session_id = None
-        self.created_at = datetime.now()
-        self.last_accessed = datetime.now()
+        # Float epoch: más barato que datetime y sin strings por mensaje
+        self.created_at = time.time()
+        self.last_accessed = self.created_at
+        
+        # Resumen acumulado de los turnos que ya no entran en la ventana
+        self.summary = ""
+        self.summary_upto_seq = -1
+        self.turns_since_summary = 0
+        self._next_seq = 0
+        self._window_start_seq = 0
+        self._evicted: List[ChatMessage] = []
+        # Contexto renderizado por n; se invalida solo al agregar o limpiar
+        self._context_cache: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        
+        # Contadores incrementales (agregar, descarte del deque, limpiar)
+        self.user_count = 0
+        self.assistant_count = 0
+        # Aviso al gestor de sesiones del cambio en el total de mensajes
+        self._on_count_change: Optional[Callable[[int], None]] = None
+        # Aviso de modificación para la persistencia write-behind
+        self._on_change: Optional[Callable[["RAMConversationMemory"], None]] = None
+    
+    def _append(self, role: Role, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            # El deque descarta el mensaje más antiguo: se guarda para resumirlo
+            full = len(self.messages) == self.max_messages
+            if full:
+                oldest = self.messages[0]
+                self._count_role(oldest.role, -1)
+                if oldest.seq > self.summary_upto_seq:
+                    self._evicted.append(oldest)
+                    if len(self._evicted) > self.max_messages:
+                        self._evicted.pop(0)
+            
+            # Mensajes cortos repetidos ("Hola", "Gracias") comparten una sola copia
+            self.messages.append(ChatMessage(
+                role, sys.intern(content) if len(content) <= 32 else content,
+                estimate_tokens(content), self._next_seq, now
+            ))
+            self._next_seq += 1
+            self._context_cache.clear()
+            self._count_role(role, 1)
+            if not full and self._on_count_change:
+                self._on_count_change(1)
+        self.last_accessed = now
+        self._notify_change()
+    
+    def _notify_change(self) -> None:
+        if self._on_change:
+            self._on_change(self)
+    
+    def _count_role(self, role: Role, delta: int) -> None:
+        if role is Role.USER:
+            self.user_count += delta
+        else:
+            self.assistant_count += delta
+    
+    def _detach_counter(self) -> int:
+        """Deja de avisar al gestor; retorna los mensajes que tenía (los descuenta el gestor)"""
+        with self._lock:
+            self._on_count_change = None
+            return len(self.messages)
     
     def add_user_message(self, content: str) -> None:
-        self.messages.append({
-            "role": "user",
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        self.last_accessed = datetime.now()
+        self._append(Role.USER, content)
+        self.turns_since_summary += 1
     
     def add_ai_message(self, content: str) -> None:
-        self.messages.append({
-            "role": "assistant",
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        self.last_accessed = datetime.now()
+        self._append(Role.ASSISTANT, content)
+    
+    def get_messages(self) -> List[ChatMessage]:
+        self.last_accessed = time.time()
+        return self._snapshot_messages()
     
-    def get_messages(self) -> List[Dict[str, str]]:
-        self.last_accessed = datetime.now()
-        return list(self.messages)
+    def _snapshot_messages(self) -> List[ChatMessage]:
+        """Copia de los mensajes tomada bajo el lock (otro hilo puede estar agregando)"""
+        with self._lock:
+            return list(self.messages)
     
-    def get_recent_messages(self, n: int = 5) -> List[Dict[str, str]]:
-        self.last_accessed = datetime.now()
-        return list(self.messages)[-n*2:] if len(self.messages) > n*2 else list(self.messages)
+    def _tail_locked(self, limit: int) -> List[ChatMessage]:
+        """Últimos limit mensajes en orden; recorre solo la cola del deque (requiere el lock)"""
+        if limit <= 0:
+            return []
+        tail = list(islice(reversed(self.messages), limit))
+        tail.reverse()
+        return tail
+    
+    def _tail(self, limit: int) -> List[ChatMessage]:
+        with self._lock:
+            return self._tail_locked(limit)
+    
+    def get_recent_messages(self, n: int = 5) -> List[ChatMessage]:
+        self.last_accessed = time.time()
+        return self._tail(n * 2)
     
     def get_context_string(self, n: int = 5) -> str:
-        recent = self.get_recent_messages(n)
-        lines = []
+        """Contexto 'Usuario:/Asistente:' de los últimos n intercambios (cacheado)"""
+        self.last_accessed = time.time()
+        with self._lock:
+            context = self._context_cache.get(n)
+            if context is None:
+                context = format_messages(self._tail_locked(n * 2))
+                self._context_cache[n] = context
+        return context
+    
+    def window(self, n: int = 5) -> ConversationWindowView:
+        """Vista de solo lectura de los últimos n intercambios"""
+        self.last_accessed = time.time()
+        return ConversationWindowView(self, n)
+    
+    def get_messages_within_budget(self, max_tokens: int) -> List[ChatMessage]:
+        """
+        Mensajes más recientes que caben en max_tokens de entrada.
+        Usa los tokens calculados al agregar cada mensaje; el último mensaje
+        se incluye siempre aunque por sí solo supere el presupuesto.
+        """
+        self.last_accessed = time.time()
+        selected = []
+        used_tokens = 0
+        # Solo la cola se recorre bajo el lock; un _append concurrente no muta el deque a mitad
+        with self._lock:
+            for msg in reversed(self.messages):
+                # Lo ya resumido no se repite en la ventana
+                if selected and msg.seq <= self.summary_upto_seq:
+                    break
+                if selected and used_tokens + msg.tokens > max_tokens:
+                    break
+                selected.append(msg)
+                used_tokens += msg.tokens
+        selected.reverse()
+        
+        # La ventana empieza en un turno del usuario; lo anterior queda para el resumen
+        while len(selected) > 1 and selected[0].role is not Role.USER:
+            used_tokens -= selected.pop(0).tokens
+        
+        if selected:
+            self._window_start_seq = selected[0].seq
+        
+        logger.info(
+            f"Context budget - session: {self.session_id}, "
+            f"messages: {len(selected)}/{len(self.messages)}, "
+            f"tokens: {used_tokens}/{max_tokens}"
+        )
+        return selected
+    
+    def get_pending_summary_messages(self) -> List[ChatMessage]:
+        """
+        Mensajes que salieron de la ventana de contexto (descartados por el deque
+        o fuera del presupuesto) y que aún no están en el resumen.
+        """
+        with self._lock:
+            pending = [m for m in self._evicted if m.seq > self.summary_upto_seq]
+            pending.extend(
+                m for m in self.messages
+                if self.summary_upto_seq < m.seq < self._window_start_seq
+            )
+        return pending
+    
+    def apply_summary(self, summary: str, upto_seq: int) -> None:
+        """Reemplaza el resumen acumulado; cubre todos los mensajes hasta upto_seq"""
+        with self._lock:
+            # Resumen obsoleto (la conversación se limpió o ya hay uno más nuevo)
+            if upto_seq <= self.summary_upto_seq:
+                return
+            self.summary = summary
+            self.summary_upto_seq = upto_seq
+            self.turns_since_summary = 0
+            self._evicted = [m for m in self._evicted if m.seq > self.summary_upto_seq]
+        self._notify_change()
+    
+    def get_message_turns(self, n: int = 5, max_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Historial reciente como turnos nativos de la API Messages.
+        Con max_tokens se empaquetan tantos mensajes como quepan en el presupuesto;
+        sin él se toman los últimos n intercambios.
+        Garantiza que el primer turno sea del usuario y que los roles alternen
+        (fusiona mensajes consecutivos del mismo rol).
+        """
+        if max_tokens is not None:
+            recent = self.get_messages_within_budget(max_tokens)
+        else:
+            recent = self.get_recent_messages(n)
+        
+        turns: List[Dict[str, str]] = []
         for msg in recent:
-            prefix = "Usuario:" if msg["role"] == "user" else "Asistente:"
-            lines.append(f"{prefix} {msg['content']}")
-        return "\n".join(lines)
+            if not turns and msg.role is not Role.USER:
+                continue
+            if turns and turns[-1]["role"] == msg.role.value:
+                turns[-1]["content"] += f"\n\n{msg.content}"
+            else:
+                turns.append({"role": msg.role.value, "content": msg.content})
+        return turns
     
     def get_conversation_summary(self) -> Dict[str, Any]:
         return {
             "total_messages": len(self.messages),
-            "user_messages": sum(1 for m in self.messages if m["role"] == "user"),
-            "assistant_messages": sum(1 for m in self.messages if m["role"] == "assistant"),
-            "created_at": self.created_at.isoformat(),
-            "last_accessed": self.last_accessed.isoformat(),
+            "user_messages": self.user_count,
+            "assistant_messages": self.assistant_count,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "last_accessed": datetime.fromtimestamp(self.last_accessed).isoformat(),
             "session_id": self.session_id
         }
     
     def clear(self) -> None:
-        self.messages.clear()
-        self.last_accessed = datetime.now()
+        with self._lock:
+            removed = len(self.messages)
+            self.messages.clear()
+            self._evicted.clear()
+            self._context_cache.clear()
+            self.user_count = 0
+            self.assistant_count = 0
+            if removed and self._on_count_change:
+                self._on_count_change(-removed)
+            self.summary = ""
+            self.summary_upto_seq = self._next_seq - 1
+            self.turns_since_summary = 0
+        self.last_accessed = time.time()
+        self._notify_change()
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Estado serializable (JSON) para los backends de persistencia"""
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "created_at": self.created_at,
+                "last_accessed": self.last_accessed,
+                "summary": self.summary,
+                "summary_upto_seq": self.summary_upto_seq,
+                "turns_since_summary": self.turns_since_summary,
+                "next_seq": self._next_seq,
+                "window_start_seq": self._window_start_seq,
+                "messages": [[m.role.value, m.content, m.tokens, m.seq, m.timestamp] for m in self.messages],
+                "evicted": [[m.role.value, m.content, m.tokens, m.seq, m.timestamp] for m in self._evicted]
+            }
+    
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any], max_messages: int = 20) -> "RAMConversationMemory":
+        """Reconstruye una memoria desde to_snapshot()"""
+        memory = cls(max_messages=max_messages)
+        memory.session_id = snapshot.get("session_id")
+        memory.created_at = snapshot.get("created_at", memory.created_at)
+        memory.summary = snapshot.get("summary", "")
+        memory.summary_upto_seq = snapshot.get("summary_upto_seq", -1)
+        memory.turns_since_summary = snapshot.get("turns_since_summary", 0)
+        memory._next_seq = snapshot.get("next_seq", 0)
+        memory._window_start_seq = snapshot.get("window_start_seq", 0)
+        
+        for role, content, tokens, seq, timestamp in snapshot.get("messages", []):
+            message = ChatMessage(Role(role), content, tokens, seq, timestamp)
+            if len(memory.messages) == memory.max_messages:
+                memory._count_role(memory.messages[0].role, -1)
+            memory.messages.append(message)
+            memory._count_role(message.role, 1)
+        memory._evicted = [
+            ChatMessage(Role(role), content, tokens, seq, timestamp)
+            for role, content, tokens, seq, timestamp in snapshot.get("evicted", [])
+        ][-memory.max_messages:]
+        return memory
     
     def set_session_id(self, session_id: str) -> None:
         self.session_id = session_id
@@ -76,43 +374,207 @@ class RAMConversationMemory:
 
 
 class SessionMemoryManager:
-    """Gestor de memorias por sesión"""
+    """
+    Gestor de memorias por sesión.
+    Seguro para uso concurrente: una sola instancia atiende a todas las sesiones.
+    - sessions es un OrderedDict en orden LRU: acceder a una sesión la mueve al
+      final y expulsar la más antigua es O(1)
+    - Un hilo en segundo plano libera las sesiones inactivas más de idle_ttl_seconds
+    - Con writer (WriteBehindQueue) las sesiones se persisten en segundo plano y
+      una sesión que no está en RAM se restaura desde el backend al volver
+    """
     
-    def __init__(self, max_sessions: int = 100, messages_per_session: int = 20):
-        self.sessions: Dict[str, RAMConversationMemory] = {}
+    def __init__(self, max_sessions: int = 100, messages_per_session: int = 20,
+                 idle_ttl_seconds: Optional[float] = None, sweep_interval_seconds: float = 60,
+                 writer: Optional[Any] = None):
+        self.sessions: "OrderedDict[str, RAMConversationMemory]" = OrderedDict()
         self.max_sessions = max_sessions
         self.messages_per_session = messages_per_session
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._lock = threading.RLock()
+        
+        self.evictions = 0
+        self.reclaimed = 0
+        
+        # Total de mensajes de todas las sesiones, mantenido por las memorias.
+        # Lock propio: las memorias avisan con su lock tomado (orden memoria -> contador)
+        self.total_messages = 0
+        self._count_lock = threading.Lock()
+        
+        self.writer = writer
+        self.restored = 0
+        
+        self._stop_event = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        if idle_ttl_seconds:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="session-sweeper", daemon=True
+            )
+            self._sweeper.start()
     
     def get_or_create_memory(self, session_id: str) -> RAMConversationMemory:
-        if session_id not in self.sessions:
+        with self._lock:
+            memory = self._touch(session_id)
+            if memory is not None:
+                return memory
+        
+        # Lectura del backend fuera del lock: no bloquea a las demás sesiones
+        snapshot = self._load_snapshot(session_id)
+        
+        with self._lock:
+            # Otra solicitud pudo crearla mientras se leía
+            memory = self._touch(session_id)
+            if memory is not None:
+                return memory
+            
             if len(self.sessions) >= self.max_sessions:
                 self._cleanup_oldest()
             
-            memory = RAMConversationMemory(max_messages=self.messages_per_session)
+            memory = self.writer.get_pending(session_id) if self.writer else None
+            if memory is None and snapshot is not None:
+                memory = RAMConversationMemory.from_snapshot(snapshot, max_messages=self.messages_per_session)
+            if memory is not None:
+                self.restored += 1
+                logger.info(f"Session restored: {session_id} ({len(memory)} messages)")
+            else:
+                memory = RAMConversationMemory(max_messages=self.messages_per_session)
             memory.set_session_id(session_id)
+            memory.last_accessed = time.time()
+            
+            memory._on_count_change = self._add_messages
+            self._add_messages(len(memory))
+            if self.writer:
+                memory._on_change = self._mark_dirty
             self.sessions[session_id] = memory
-        
-        return self.sessions[session_id]
+            return memory
+    
+    def _touch(self, session_id: str) -> Optional[RAMConversationMemory]:
+        """Sesión en RAM marcada como la más reciente (requiere el lock)"""
+        memory = self.sessions.get(session_id)
+        if memory is not None:
+            self.sessions.move_to_end(session_id)
+            memory.last_accessed = time.time()
+        return memory
+    
+    def _load_snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot persistido de una sesión que no está en RAM"""
+        if not self.writer or self.writer.is_deleted(session_id) or self.writer.get_pending(session_id):
+            return None
+        try:
+            return self.writer.store.load(session_id)
+        except Exception as e:
+            logger.error(f"Error loading session {session_id}: {e}")
+            return None
+    
+    def _mark_dirty(self, memory: RAMConversationMemory) -> None:
+        self.writer.mark_dirty(memory.session_id, memory)
+    
+    def _add_messages(self, delta: int) -> None:
+        with self._count_lock:
+            self.total_messages += delta
+    
+    def _release(self, memory: RAMConversationMemory) -> None:
+        """
+        Descuenta los mensajes de una sesión que sale de RAM.
+        Lo ya persistido sigue en el backend; la cola write-behind conserva
+        la referencia a lo pendiente hasta escribirlo.
+        """
+        memory._on_change = None
+        self._add_messages(-memory._detach_counter())
     
     def get_memory(self, session_id: str) -> Optional[RAMConversationMemory]:
-        return self.sessions.get(session_id)
+        with self._lock:
+            return self.sessions.get(session_id)
+    
+    def peek_messages(self, session_id: str) -> List[ChatMessage]:
+        """
+        Mensajes de una sesión sin registrarla ni marcarla como usada:
+        RAM, luego lo pendiente de escribir y por último el backend.
+        """
+        memory = self.get_memory(session_id)
+        if memory is None and self.writer:
+            memory = self.writer.get_pending(session_id)
+        if memory is None:
+            snapshot = self._load_snapshot(session_id)
+            if snapshot is None:
+                return []
+            memory = RAMConversationMemory.from_snapshot(snapshot, max_messages=self.messages_per_session)
+        return memory._snapshot_messages()
     
     def delete_memory(self, session_id: str) -> bool:
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            return True
-        return False
+        with self._lock:
+            memory = self.sessions.pop(session_id, None)
+            if self.writer:
+                self.writer.mark_deleted(session_id)
+            if memory is None:
+                return False
+            self._release(memory)
+        memory.clear()
+        return True
     
     def _cleanup_oldest(self) -> None:
+        """Expulsa la sesión usada hace más tiempo (requiere el lock)"""
         if not self.sessions:
             return
-        oldest_id = min(self.sessions.keys(), 
-                       key=lambda sid: self.sessions[sid].last_accessed)
-        del self.sessions[oldest_id]
+        oldest_id, memory = self.sessions.popitem(last=False)
+        self._release(memory)
+        self.evictions += 1
+        logger.info(f"Session evicted (capacity): {oldest_id}")
+    
+    def sweep_idle(self) -> int:
+        """
+        Libera las sesiones sin actividad durante idle_ttl_seconds.
+        Recorre desde la menos reciente y se detiene en la primera activa.
+        """
+        if not self.idle_ttl_seconds:
+            return 0
+        
+        cutoff = time.time() - self.idle_ttl_seconds
+        reclaimed = 0
+        with self._lock:
+            while self.sessions:
+                session_id, memory = next(iter(self.sessions.items()))
+                if memory.last_accessed >= cutoff:
+                    break
+                del self.sessions[session_id]
+                self._release(memory)
+                reclaimed += 1
+            self.reclaimed += reclaimed
+        
+        if reclaimed:
+            logger.info(f"Idle sessions reclaimed: {reclaimed}")
+        return reclaimed
+    
+    def _sweep_loop(self) -> None:
+        while not self._stop_event.wait(self.sweep_interval_seconds):
+            try:
+                self.sweep_idle()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+    
+    def shutdown(self) -> None:
+        """Detiene el barrido, escribe lo pendiente y libera todas las sesiones"""
+        self._stop_event.set()
+        if self._sweeper is not None and self._sweeper is not threading.current_thread():
+            self._sweeper.join(timeout=5)
+        if self.writer:
+            self.writer.shutdown()
+            self.writer.store.close()
+        with self._lock:
+            for memory in self.sessions.values():
+                self._release(memory)
+            self.sessions.clear()
     
     def get_stats(self) -> Dict[str, Any]:
-        return {
-            "active_sessions": len(self.sessions),
-            "max_sessions": self.max_sessions,
-            "total_messages": sum(len(m) for m in self.sessions.values())
-        }
\ No newline at end of file
+        with self._lock:
+            return {
+                "active_sessions": len(self.sessions),
+                "max_sessions": self.max_sessions,
+                "total_messages": self.total_messages,
+                "evictions": self.evictions,
+                "reclaimed_sessions": self.reclaimed,
+                "restored_sessions": self.restored,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "persistence": self.writer.get_stats() if self.writer else None
+            }
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Iterator
 import logging
 from datetime import datetime
 
@@ -11,20 +11,24 @@ class ConversationOrchestrator:
     """
     Orquestador único.
     Gestiona agente y sesiones en RAM.
-    NO persiste conversaciones.
+    La persistencia (si está activada) la hace el agente en segundo plano.
+    Pensado para una sola instancia por proceso compartida entre sesiones.
     """
     
     def __init__(self):
         self.agent = TEAOptimizedAgent()
         logger.info("ConversationOrchestrator initialized")
     
-    def handle_message(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    def handle_message(self, message: str, session_id: Optional[str] = None, use_cache: bool = True, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Procesa mensaje sin persistencia.
+        Procesa un mensaje; la conversación se persiste en segundo plano
+        si hay un backend configurado (write-behind).
         
         Args:
             message: Mensaje del usuario
-            session_id: ID de sesión (IP del usuario)
+            session_id: ID de la sesión del navegador
+            use_cache: False para ignorar la caché de respuestas
+            user_id: ID para el límite diario de imágenes (IP del usuario)
         
         Returns:
             Respuesta del agente
@@ -33,7 +37,7 @@ class ConversationOrchestrator:
             session_id = get_client_ip() or f"session_{datetime.now().timestamp()}"
         
         try:
-            response = self.agent.process_message(session_id, message)
+            response = self.agent.process_message(session_id, message, use_cache=use_cache, user_id=user_id)
             return response
             
         except Exception as e:
@@ -43,10 +47,46 @@ class ConversationOrchestrator:
                 "error": str(e)
             }
     
+    def handle_message_stream(self, message: str, session_id: Optional[str] = None, use_cache: bool = True, user_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Variante generadora de handle_message.
+        
+        Args:
+            message: Mensaje del usuario
+            session_id: ID de la sesión del navegador
+            use_cache: False para ignorar la caché de respuestas
+            user_id: ID para el límite diario de imágenes (IP del usuario)
+        
+        Yields:
+            Eventos "chunk" con texto parcial y un evento final "done"
+            con la misma estructura que handle_message
+        """
+        if not session_id:
+            session_id = get_client_ip() or f"session_{datetime.now().timestamp()}"
+        
+        try:
+            yield from self.agent.process_message_stream(session_id, message, use_cache=use_cache, user_id=user_id)
+            
+        except Exception as e:
+            logger.error(f"Orchestrator stream error: {e}", exc_info=True)
+            yield {
+                "type": "done",
+                "response": "Lo siento, ocurrió un error interno.",
+                "error": str(e)
+            }
+    
+    def get_image_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de un trabajo de generación de imagen"""
+        return self.agent.get_image_job(job_id)
+    
     def clear_session(self, session_id: str) -> bool:
         """Limpia una sesión específica"""
         return self.agent.clear_session(session_id)
     
+    def get_session_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """Mensajes guardados de la sesión (restaurados del backend si hace falta)"""
+        return self.agent.get_session_messages(session_id)
+    
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """Estadísticas de sesión"""
         return self.agent.get_session_stats(session_id)
@@ -55,37 +95,23 @@ class ConversationOrchestrator:
     def reset_session(self, session_id: str) -> bool:
         """
         Resetea una sesión específica.
-        Limpia la memoria de la conversación y los metadatos.
+        Libera la memoria de la conversación en el agente.
         
         Args:
             session_id: ID de la sesión a resetear
         
         Returns:
-            bool: True si se reseteó correctamente
+            bool: True si se reseteó correctamente (también si la sesión ya no existía)
         """
         try:
-            # 1. Limpiar metadata de la sesión
-            if session_id in self.session_metadata:
-                del self.session_metadata[session_id]
-                logger.info(f"Session metadata cleared for {session_id}")
-            
-            # 2. Limpiar memoria del agente
-            if hasattr(self, 'agent'):
-                # Si el agente tiene memory_manager (tu implementación actual)
-                if hasattr(self.agent, 'memory_manager'):
-                    self.agent.memory_manager.delete_memory(session_id)
-                    logger.info(f"Agent memory cleared for {session_id}")
-                
-                # Si el agente tiene método clear_session
-                elif hasattr(self.agent, 'clear_session'):
-                    self.agent.clear_session(session_id)
-                
-                # Si el agente tiene método reset_conversation
-                elif hasattr(self.agent, 'reset_conversation'):
-                    self.agent.reset_conversation(session_id)
-            
+            if self.agent.clear_session(session_id):
+                logger.info(f"Agent memory cleared for {session_id}")
             return True
             
         except Exception as e:
             logger.error(f"Error resetting session {session_id}: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def shutdown(self) -> None:
+        """Detiene los hilos del agente y libera todas las sesiones"""
+        self.agent.shutdown()
\ No newline at end of file
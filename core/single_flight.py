@@ -0,0 +1,88 @@
+"""
+Coalescencia de solicitudes idénticas en vuelo (single-flight).
+Si varias sesiones piden lo mismo a la vez, solo la primera invoca al modelo;
+las demás esperan y comparten su resultado.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class InFlightCall:
+    """Invocación en curso; los seguidores esperan su resultado"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        if not self._event.wait(timeout):
+            raise TimeoutError("Timed out waiting for in-flight request")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _resolve(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self.result = result
+        self.error = error
+        self._event.set()
+
+
+class SingleFlight:
+    """Registro de invocaciones en vuelo por clave"""
+
+    def __init__(self, wait_timeout: float = 120.0):
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[str, InFlightCall] = {}
+        self._lock = threading.Lock()
+
+        self.executed = 0
+        self.calls_saved = 0
+
+    def begin(self, key: str) -> Tuple[InFlightCall, bool]:
+        """Retorna (llamada, es_líder). El líder debe llamar a finish()"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.calls_saved += 1
+                return call, False
+
+            call = InFlightCall()
+            self._calls[key] = call
+            self.executed += 1
+            return call, True
+
+    def finish(self, key: str, call: InFlightCall, result: Any = None,
+               error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call._resolve(result, error)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Ejecuta fn una sola vez por clave en vuelo. Retorna (resultado, compartido)"""
+        call, is_leader = self.begin(key)
+        if not is_leader:
+            return call.wait(self.wait_timeout), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+
+        self.finish(key, call, result=result)
+        return result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "calls_saved": self.calls_saved
+            }
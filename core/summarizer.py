@@ -0,0 +1,109 @@
+"""
+Resumen incremental de conversaciones largas.
+Los turnos que salen de la ventana de contexto se integran en un resumen
+acumulado, refrescado en segundo plano cada N turnos con un modelo barato.
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set
+
+from core.memory import ChatMessage, RAMConversationMemory, format_messages
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Actualiza el resumen de una conversación entre un usuario y el asistente Ignatius.
+
+RESUMEN ACTUAL:
+{summary}
+
+MENSAJES NUEVOS A INTEGRAR:
+{messages}
+
+Escribe el resumen actualizado:
+- Máximo 8 oraciones cortas.
+- Conserva datos importantes: nombre, idioma preferido, temas, preguntas pendientes.
+- Lenguaje literal, sin opiniones.
+- Solo el resumen, sin explicaciones.
+
+RESUMEN ACTUALIZADO:"""
+
+
+class ConversationSummarizer:
+    """
+    Resumidor en segundo plano.
+    Una sola tarea por sesión a la vez; el hilo del chat nunca espera.
+    """
+
+    def __init__(self, bedrock_client, model_id: str, every_n_turns: int = 4,
+                 max_summary_tokens: int = 300, max_workers: int = 2):
+        self.bedrock_client = bedrock_client
+        self.model_id = model_id
+        self.every_n_turns = every_n_turns
+        self.max_summary_tokens = max_summary_tokens
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarizer")
+        self._in_progress: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def maybe_schedule(self, memory: RAMConversationMemory) -> bool:
+        """Programa un resumen si tocan N turnos y hay mensajes fuera de la ventana"""
+        if memory.turns_since_summary < self.every_n_turns:
+            return False
+
+        key = id(memory)
+        with self._lock:
+            if key in self._in_progress:
+                return False
+            self._in_progress.add(key)
+
+        self._executor.submit(self._run, memory, key)
+        return True
+
+    def _run(self, memory: RAMConversationMemory, key: int) -> None:
+        try:
+            pending = memory.get_pending_summary_messages()
+            if not pending:
+                return
+
+            summary = self._summarize(memory.summary, pending)
+            if summary:
+                memory.apply_summary(summary, pending[-1].seq)
+                logger.info(
+                    f"Conversation summary refreshed - session: {memory.session_id}, "
+                    f"folded_messages: {len(pending)}"
+                )
+
+        except Exception as e:
+            logger.error(f"Summary generation failed for session {memory.session_id}: {e}")
+
+        finally:
+            with self._lock:
+                self._in_progress.discard(key)
+
+    def _summarize(self, summary: str, messages: List[ChatMessage]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(sin resumen previo)",
+            messages=format_messages(messages)
+        )
+
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": self.max_summary_tokens,
+            "temperature": 0.0,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+
+        response = self.bedrock_client.invoke_model(
+            modelId=self.model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body)
+        )
+
+        response_body = json.loads(response['body'].read())
+        return response_body['content'][0]['text'].strip()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
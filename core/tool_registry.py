@@ -0,0 +1,50 @@
+"""
+Registro de tools del agente.
+Las tools se construyen una sola vez al iniciar el agente, comparten sus
+clientes y se despachan por nombre en lugar de crearse en cada solicitud.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+from langchain.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+
+class ToolRegistry:
+    """Tabla nombre -> instancia de tool"""
+
+    def __init__(self):
+        self._tools: Dict[str, BaseTool] = {}
+
+    def register(self, tool: BaseTool) -> BaseTool:
+        if tool.name in self._tools:
+            raise ValueError(f"Tool already registered: {tool.name}")
+        self._tools[tool.name] = tool
+        logger.info(f"Tool registered: {tool.name}")
+        return tool
+
+    def get(self, name: str) -> BaseTool:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise KeyError(f"Unknown tool: {name}") from None
+
+    def run(self, name: str, *args, **kwargs) -> Any:
+        """Ejecuta la tool de forma síncrona"""
+        return self.get(name)._run(*args, **kwargs)
+
+    async def arun(self, name: str, *args, **kwargs) -> Any:
+        """
+        Ejecuta la tool de forma asíncrona.
+        El agente (Streamlit, síncrono) usa run(); las tools sobre ChatBedrock
+        resuelven ainvoke con un hilo del executor, no con I/O async real.
+        """
+        return await self.get(name)._arun(*args, **kwargs)
+
+    def names(self) -> List[str]:
+        return list(self._tools.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Errores transitorios de Bedrock que vale la pena reintentar
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "InternalServerException",
+}
+
+# Throttling: Bedrock está sano pero saturado; lo resuelve el backoff, no el breaker
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+}
+
+
+class CircuitOpenError(Exception):
+    """Bedrock está degradado para este modelo: se falla rápido sin invocarlo"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por modelo.
+    closed -> open tras N llamadas seguidas fallidas por errores transitorios
+    (contadas una vez por llamada, agotados los reintentos; sin throttling);
+    open -> half_open pasado reset_timeout (se deja pasar una prueba).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> bool:
+        """Registra un fallo; retorna True si el circuito acaba de abrirse"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                was_open = self.state == "open"
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                return not was_open
+            return False
+
+
+class BedrockInvoker:
+    """
+    Capa compartida de invocación a Bedrock.
+    Expone invoke_model e invoke_model_with_response_stream con la misma firma
+    que el cliente boto3, añadiendo backoff exponencial con jitter ante
+    throttling y un circuit breaker por modelo.
+    """
+
+    def __init__(self, client, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 8.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.client = client
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+        self.retries = 0
+        self.throttles = 0
+        self.circuit_opens = 0
+        self.short_circuited = 0
+
+    def invoke_model(self, **kwargs) -> Dict[str, Any]:
+        return self._call(self.client.invoke_model, kwargs)
+
+    def invoke_model_with_response_stream(self, **kwargs) -> Dict[str, Any]:
+        # Solo se reintenta la apertura del stream, no los eventos ya recibidos
+        return self._call(self.client.invoke_model_with_response_stream, kwargs)
+
+    def _get_breaker(self, model_id: str) -> CircuitBreaker:
+        with self._lock:
+            if model_id not in self._breakers:
+                self._breakers[model_id] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[model_id]
+
+    @staticmethod
+    def _is_throttle(error: Exception) -> bool:
+        return isinstance(error, ClientError) and \
+            error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, ClientError):
+            return error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+        return isinstance(error, (BotoConnectionError, ReadTimeoutError))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full jitter: espera aleatoria entre 0 y base * 2^intento (acotado)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _call(self, fn: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        model_id = kwargs.get("modelId", "unknown")
+        breaker = self._get_breaker(model_id)
+
+        if not breaker.allow_request():
+            with self._lock:
+                self.short_circuited += 1
+            raise CircuitOpenError(f"Bedrock circuit open for model {model_id}")
+
+        for attempt in range(self.max_attempts):
+            try:
+                response = fn(**kwargs)
+                breaker.record_success()
+                return response
+
+            except Exception as e:
+                if not self._is_retryable(e):
+                    # Bedrock respondió (p. ej. ValidationException): el servicio está sano
+                    breaker.record_success()
+                    raise
+
+                throttled = self._is_throttle(e)
+                if throttled:
+                    with self._lock:
+                        self.throttles += 1
+
+                if attempt == self.max_attempts - 1:
+                    # Un solo fallo por llamada, y solo si no fue throttling
+                    if throttled:
+                        breaker.record_success()
+                    elif breaker.record_failure():
+                        with self._lock:
+                            self.circuit_opens += 1
+                        logger.warning(f"Bedrock circuit opened for model {model_id}: {e}")
+                    raise
+
+                delay = self._backoff_delay(attempt)
+                with self._lock:
+                    self.retries += 1
+                logger.warning(
+                    f"Bedrock transient error on {model_id} (attempt {attempt + 1}/{self.max_attempts}), "
+                    f"retrying in {delay:.2f}s: {e}"
+                )
+                time.sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "throttles": self.throttles,
+                "circuit_opens": self.circuit_opens,
+                "short_circuited": self.short_circuited,
+                "open_circuits": [m for m, b in self._breakers.items() if b.state != "closed"]
+            }
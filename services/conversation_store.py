@@ -0,0 +1,382 @@
+"""
+Persistencia de conversaciones.
+Interfaz de backend con implementaciones en memoria, SQLite (WAL) y DynamoDB,
+más una cola write-behind: el chat solo marca la sesión como modificada y un
+hilo en segundo plano escribe los snapshots por lotes.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore(ABC):
+    """Backend de almacenamiento: un snapshot JSON por sesión"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot guardado de la sesión, o None si no existe"""
+
+    @abstractmethod
+    def save_batch(self, snapshots: Dict[str, Dict[str, Any]], deleted: List[str]) -> None:
+        """Guarda varios snapshots y borra sesiones en una sola operación"""
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Backend en memoria del proceso (pruebas y desarrollo); serializa igual que los demás"""
+
+    def __init__(self):
+        self._data: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._data.get(session_id)
+        return json.loads(data) if data else None
+
+    def save_batch(self, snapshots: Dict[str, Dict[str, Any]], deleted: List[str]) -> None:
+        encoded = {sid: json.dumps(snap, ensure_ascii=False) for sid, snap in snapshots.items()}
+        with self._lock:
+            self._data.update(encoded)
+            for session_id in deleted:
+                self._data.pop(session_id, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Backend SQLite en modo WAL: las lecturas no bloquean al escritor
+    y cada lote se escribe en una sola transacción.
+    ttl_seconds: las filas sin actualizar en ese tiempo se borran al escribir
+    (a lo sumo una vez por PURGE_INTERVAL_SECONDS).
+    """
+
+    PURGE_INTERVAL_SECONDS = 300
+
+    def __init__(self, path: str, ttl_seconds: Optional[int] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)"
+            )
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM conversations WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_batch(self, snapshots: Dict[str, Dict[str, Any]], deleted: List[str]) -> None:
+        now = time.time()
+        rows = [(sid, json.dumps(snap, ensure_ascii=False), now) for sid, snap in snapshots.items()]
+        purge = bool(self.ttl_seconds) and now - self._last_purge >= self.PURGE_INTERVAL_SECONDS
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO conversations (session_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    rows
+                )
+                self._conn.executemany(
+                    "DELETE FROM conversations WHERE session_id = ?", [(sid,) for sid in deleted]
+                )
+                if purge:
+                    self._conn.execute(
+                        "DELETE FROM conversations WHERE updated_at < ?", (now - self.ttl_seconds,)
+                    )
+                    self._last_purge = now
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DynamoDBConversationStore(ConversationStore):
+    """
+    Backend DynamoDB (clave de partición session_id).
+    endpoint_url permite apuntar a DynamoDB Local para pruebas.
+    ttl_seconds llena el atributo expires_at para el TTL nativo de la tabla.
+    """
+
+    BATCH_SIZE = 25  # Máximo de BatchWriteItem
+    MAX_RETRIES = 5
+
+    def __init__(self, table_name: str, region_name: str, endpoint_url: Optional[str] = None,
+                 ttl_seconds: Optional[int] = None, client=None, **client_kwargs):
+        if client is None:
+            import boto3
+            client = boto3.client('dynamodb', region_name=region_name,
+                                  endpoint_url=endpoint_url or None, **client_kwargs)
+        self.dynamodb = client
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        response = self.dynamodb.get_item(
+            TableName=self.table_name,
+            Key={'session_id': {'S': session_id}},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+        return json.loads(item['data']['S']) if item else None
+
+    def save_batch(self, snapshots: Dict[str, Dict[str, Any]], deleted: List[str]) -> None:
+        now = int(time.time())
+        requests = []
+        for session_id, snapshot in snapshots.items():
+            item = {
+                'session_id': {'S': session_id},
+                'data': {'S': json.dumps(snapshot, ensure_ascii=False)},
+                'updated_at': {'N': str(now)}
+            }
+            if self.ttl_seconds:
+                item['expires_at'] = {'N': str(now + self.ttl_seconds)}
+            requests.append({'PutRequest': {'Item': item}})
+        for session_id in deleted:
+            requests.append({'DeleteRequest': {'Key': {'session_id': {'S': session_id}}}})
+
+        for start in range(0, len(requests), self.BATCH_SIZE):
+            self._write_chunk(requests[start:start + self.BATCH_SIZE])
+
+    def _write_chunk(self, chunk: List[Dict[str, Any]]) -> None:
+        pending = {self.table_name: chunk}
+        for attempt in range(self.MAX_RETRIES):
+            response = self.dynamodb.batch_write_item(RequestItems=pending)
+            pending = response.get('UnprocessedItems') or {}
+            if not pending:
+                return
+            time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        raise RuntimeError(f"DynamoDB left {len(pending.get(self.table_name, []))} items unprocessed")
+
+
+class WriteBehindQueue:
+    """
+    Cola write-behind de snapshots.
+    - mark_dirty() es O(1) y no toca disco: el chat nunca espera
+    - Varias modificaciones de la misma sesión entre dos vaciados se escriben una sola vez
+    - Si un lote falla se reintenta sesión por sesión: una sesión que no se puede
+      escribir (p. ej. un item de DynamoDB de más de 400 KB) no bloquea a las demás
+      y se descarta tras MAX_ITEM_FAILURES intentos aislados
+    - Si falla todo (backend caído), todo vuelve a la cola y los reintentos
+      se espacian con backoff exponencial hasta MAX_BACKOFF_SECONDS
+    """
+
+    MAX_ITEM_FAILURES = 3
+    MAX_BACKOFF_SECONDS = 60.0
+    # Intentos aislados seguidos sin ningún éxito que se toman como backend caído
+    OUTAGE_PROBES = 3
+
+    def __init__(self, store: ConversationStore, flush_interval_seconds: float = 1.0,
+                 max_batch: int = 100):
+        self.store = store
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch = max_batch
+        self._dirty: Dict[str, Any] = {}
+        # Lote que se está escribiendo: sigue visible hasta que save_batch retorna
+        self._in_flight: Dict[str, Any] = {}
+        self._deleted: Dict[str, None] = {}
+        # Fallos aislados por sesión (solo las que fallaron mientras otras se escribían)
+        self._item_failures: Dict[str, int] = {}
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._loop, name="conversation-writer", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, session_id: str, memory: Any) -> None:
+        with self._lock:
+            self._deleted.pop(session_id, None)
+            self._dirty[session_id] = memory
+            full = len(self._dirty) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def mark_deleted(self, session_id: str) -> None:
+        with self._lock:
+            self._dirty.pop(session_id, None)
+            self._deleted[session_id] = None
+
+    def get_pending(self, session_id: str) -> Optional[Any]:
+        """Memoria aún no escrita (p. ej. expulsada de RAM antes del vaciado)"""
+        with self._lock:
+            memory = self._dirty.get(session_id)
+            return memory if memory is not None else self._in_flight.get(session_id)
+
+    def is_deleted(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._deleted
+
+    def _next_wait(self) -> float:
+        if not self._consecutive_failures:
+            return self.flush_interval_seconds
+        return min(self.flush_interval_seconds * (2 ** self._consecutive_failures), self.MAX_BACKOFF_SECONDS)
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            # Durante el backoff un lote lleno no adelanta el reintento
+            if self._consecutive_failures:
+                self._stopped.wait(self._next_wait())
+            else:
+                self._wake.wait(self._next_wait())
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Escribe todo lo pendiente; retorna el número de sesiones escritas"""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                deleted, self._deleted = list(self._deleted), {}
+                self._in_flight = dirty
+            if not dirty and not deleted:
+                return 0
+
+            try:
+                snapshots = {sid: memory.to_snapshot() for sid, memory in dirty.items()}
+                self.store.save_batch(snapshots, deleted)
+                written, failed_dirty, failed_deleted = list(snapshots), {}, []
+            except Exception as e:
+                logger.warning(f"Conversation batch failed ({len(dirty)} sessions), retrying one by one: {e}")
+                written, failed_dirty, failed_deleted = self._write_isolated(dirty, deleted)
+
+            with self._lock:
+                self._in_flight = {}
+                for sid in written:
+                    self._item_failures.pop(sid, None)
+                for sid in deleted:
+                    if sid not in failed_deleted:
+                        self._item_failures.pop(sid, None)
+                # Lo marcado después del fallo es más nuevo y tiene prioridad
+                for sid, memory in failed_dirty.items():
+                    if sid not in self._deleted:
+                        self._dirty.setdefault(sid, memory)
+                for sid in failed_deleted:
+                    if sid not in self._dirty:
+                        self._deleted[sid] = None
+
+                if failed_dirty or failed_deleted:
+                    self.failures += 1
+                    self._consecutive_failures += 1
+                else:
+                    self._consecutive_failures = 0
+                    self.flushes += 1
+                self.written += len(written)
+            return len(written)
+
+    def _write_isolated(self, dirty: Dict[str, Any], deleted: List[str]):
+        """
+        Escribe un lote fallido de a una sesión.
+        Retorna (escritas, memorias a reintentar, borrados a reintentar).
+        """
+        items = list(dirty.items()) + [(sid, None) for sid in deleted]
+        written: List[str] = []
+        failed: List[str] = []
+        error: Optional[Exception] = None
+
+        for sid, memory in items:
+            # Sin ningún éxito tras varios intentos se asume el backend caído
+            if not written and len(failed) >= self.OUTAGE_PROBES:
+                break
+            try:
+                if memory is None:
+                    self.store.save_batch({}, [sid])
+                else:
+                    self.store.save_batch({sid: memory.to_snapshot()}, [])
+                    written.append(sid)
+            except Exception as e:
+                error = e
+                failed.append(sid)
+
+        if not written:
+            # Nada se pudo escribir: todo vuelve a la cola sin culpar a ninguna sesión
+            logger.error(f"Conversation store unavailable, {len(items)} sessions requeued: {error}")
+            return written, dict(dirty), list(deleted)
+
+        # Otras sesiones sí se escribieron: las que fallaron tienen un problema propio
+        failed_set = set(failed)
+        with self._lock:
+            for sid in failed:
+                count = self._item_failures.get(sid, 0) + 1
+                if count < self.MAX_ITEM_FAILURES:
+                    self._item_failures[sid] = count
+                    logger.warning(f"Conversation {sid} failed to write ({count}/{self.MAX_ITEM_FAILURES}): {error}")
+                    continue
+                self._item_failures.pop(sid, None)
+                failed_set.discard(sid)
+                self.dropped += 1
+                logger.error(f"Conversation {sid} dropped after {count} failed writes")
+
+        failed_dirty = {sid: memory for sid, memory in dirty.items() if sid in failed_set}
+        failed_deleted = [sid for sid in deleted if sid in failed_set]
+        return written, failed_dirty, failed_deleted
+
+    def shutdown(self) -> None:
+        """Detiene el hilo y escribe lo pendiente"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._dirty) + len(self._deleted),
+                "flushes": self.flushes,
+                "written": self.written,
+                "failures": self.failures,
+                "dropped": self.dropped
+            }
+
+
+def create_conversation_store(backend: str, sqlite_path: str = "", table_name: str = "",
+                              region_name: str = "us-east-1", endpoint_url: Optional[str] = None,
+                              ttl_seconds: Optional[int] = None, **client_kwargs) -> Optional[ConversationStore]:
+    """Crea el backend configurado ("memory", "sqlite", "dynamodb"); None si está desactivado"""
+    backend = (backend or "").lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return InMemoryConversationStore()
+    if backend == "sqlite":
+        return SQLiteConversationStore(sqlite_path, ttl_seconds=ttl_seconds)
+    if backend == "dynamodb":
+        return DynamoDBConversationStore(table_name, region_name, endpoint_url=endpoint_url,
+                                         ttl_seconds=ttl_seconds, **client_kwargs)
+    raise ValueError(f"Unknown conversation store backend: {backend}")
@@ -7,16 +7,20 @@ from config.settings import settings
 logger = logging.getLogger(__name__)
 
 class ImageUsageRepository:
-    """Repositorio para control de límite diario de imágenes"""
+    """
+    Repositorio para control de límite diario de imágenes.
+    Usa el cliente de bajo nivel de DynamoDB (thread-safe, a diferencia de
+    boto3.resource) para poder compartir una instancia entre sesiones.
+    """
     
     def __init__(self):
-        self.dynamodb = boto3.resource(
+        self.dynamodb = boto3.client(
             'dynamodb',
             region_name=settings.aws_region,
             aws_access_key_id=settings.aws_access_key_id,
             aws_secret_access_key=settings.aws_secret_access_key
         )
-        self.table = self.dynamodb.Table(settings.dynamodb_image_usage_table)
+        self.table_name = settings.dynamodb_image_usage_table
         self.max_images = settings.max_images_per_day
     
     def check_and_increment(self, user_id: str) -> tuple[bool, int]:
@@ -31,17 +35,18 @@ class ImageUsageRepository:
         
         try:
             # UpdateItem con condición para operación atómica
-            response = self.table.update_item(
+            response = self.dynamodb.update_item(
+                TableName=self.table_name,
                 Key={
-                    'user_id': user_id,
-                    'date': today
+                    'user_id': {'S': user_id},
+                    'date': {'S': today}
                 },
                 UpdateExpression="ADD images_generated_today :inc",
-                ExpressionAttributeValues={':inc': 1},
+                ExpressionAttributeValues={':inc': {'N': '1'}},
                 ReturnValues="UPDATED_NEW"
             )
             
-            new_count = int(response['Attributes']['images_generated_today'])
+            new_count = int(response['Attributes']['images_generated_today']['N'])
             remaining = max(0, self.max_images - new_count)
             
             if new_count > self.max_images:
@@ -66,12 +71,13 @@ class ImageUsageRepository:
         today = datetime.now().strftime("%Y-%m-%d")
         
         try:
-            response = self.table.get_item(
-                Key={'user_id': user_id, 'date': today}
+            response = self.dynamodb.get_item(
+                TableName=self.table_name,
+                Key={'user_id': {'S': user_id}, 'date': {'S': today}}
             )
             
             if 'Item' in response:
-                count = int(response['Item'].get('images_generated_today', 0))
+                count = int(response['Item'].get('images_generated_today', {}).get('N', 0))
                 return max(0, self.max_images - count)
             
             return self.max_images
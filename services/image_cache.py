@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """
+    Caché de imágenes en disco local, direccionada por contenido.
+    - objects/<sha256>.png: bytes de la imagen (una sola copia por contenido)
+    - keys/<clave>: sha256 del objeto para esa combinación de parámetros
+    Expulsión LRU por tamaño total; el orden se reconstruye por mtime al arrancar.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.keys_dir = os.path.join(cache_dir, "keys")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.keys_dir, exist_ok=True)
+
+        self._lru: "OrderedDict[str, str]" = OrderedDict()  # clave -> digest
+        self._object_sizes: Dict[str, int] = {}
+        self._object_refs: Dict[str, int] = {}
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    @staticmethod
+    def make_key(prompt: str, width: int, height: int, cfg_scale: float,
+                 quality: str, seed_bucket: int) -> str:
+        params = json.dumps(
+            [prompt, width, height, cfg_scale, quality, seed_bucket],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.png")
+
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self.keys_dir, key)
+
+    def _load_index(self) -> None:
+        entries = []
+        for key in os.listdir(self.keys_dir):
+            path = self._key_path(key)
+            try:
+                with open(path, "r") as f:
+                    digest = f.read().strip()
+                size = os.path.getsize(self._object_path(digest))
+                entries.append((os.path.getmtime(path), key, digest, size))
+            except OSError:
+                # Clave huérfana (objeto borrado a mano o escritura interrumpida)
+                self._remove_file(path)
+
+        for _, key, digest, size in sorted(entries):
+            self._track(key, digest, size)
+
+        self._evict()
+        logger.info(f"ImageCache loaded - entries: {len(self._lru)}, bytes: {self.total_bytes}")
+
+    def _track(self, key: str, digest: str, size: int) -> None:
+        self._lru[key] = digest
+        if digest not in self._object_refs:
+            self._object_refs[digest] = 0
+            self._object_sizes[digest] = size
+            self.total_bytes += size
+        self._object_refs[digest] += 1
+
+    def _untrack(self, key: str) -> None:
+        digest = self._lru.pop(key)
+        self._remove_file(self._key_path(key))
+        self._object_refs[digest] -= 1
+        if self._object_refs[digest] == 0:
+            del self._object_refs[digest]
+            self.total_bytes -= self._object_sizes.pop(digest)
+            self._remove_file(self._object_path(digest))
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._lru:
+            oldest_key = next(iter(self._lru))
+            self._untrack(oldest_key)
+            self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            digest = self._lru.get(key)
+            if digest is None:
+                self.misses += 1
+                return None
+
+            try:
+                with open(self._object_path(digest), "rb") as f:
+                    data = f.read()
+            except OSError:
+                self._untrack(key)
+                self.misses += 1
+                return None
+
+            self._lru.move_to_end(key)
+            try:
+                os.utime(self._key_path(key))
+            except OSError:
+                pass
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if key in self._lru:
+                self._untrack(key)
+
+            object_path = self._object_path(digest)
+            if not os.path.exists(object_path):
+                self._atomic_write(object_path, data)
+            self._atomic_write(self._key_path(key), digest.encode("ascii"))
+
+            self._track(key, digest, len(data))
+            self._evict()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "objects": len(self._object_refs),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
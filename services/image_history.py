@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class ImageHistoryStore:
+    """
+    Historial de imágenes generadas para la interfaz.
+    - La imagen completa se guarda una vez en disco (<id>.png) para descargarla
+    - Para el historial se usa una miniatura WebP pequeña, generada una sola vez
+      y conservada en un LRU en memoria; si se expulsa se regenera desde disco
+    Así un rerun de Streamlit no vuelve a decodificar las imágenes completas.
+    Las imágenes vencidas se borran a lo sumo una vez por purge_interval_seconds.
+    """
+
+    def __init__(self, base_dir: str, thumb_px: int = 200, thumb_quality: int = 70,
+                 max_thumbnails: int = 500, retention_seconds: float = 24 * 3600,
+                 purge_interval_seconds: float = 600):
+        self.base_dir = base_dir
+        self.thumb_px = thumb_px
+        self.thumb_quality = thumb_quality
+        self.max_thumbnails = max_thumbnails
+        self.retention_seconds = retention_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self._last_purge = 0.0
+        os.makedirs(base_dir, exist_ok=True)
+
+        self._thumbnails: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.thumb_hits = 0
+        self.thumb_builds = 0
+
+    def _full_path(self, image_id: str) -> str:
+        return os.path.join(self.base_dir, f"{image_id}.png")
+
+    def _make_thumbnail(self, image_bytes: bytes) -> bytes:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.thumbnail((self.thumb_px, self.thumb_px))
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            out = io.BytesIO()
+            img.save(out, format="WEBP", quality=self.thumb_quality)
+        self.thumb_builds += 1
+        return out.getvalue()
+
+    def _remember(self, image_id: str, thumbnail: bytes) -> None:
+        """Guarda la miniatura en el LRU (requiere el lock)"""
+        self._thumbnails[image_id] = thumbnail
+        self._thumbnails.move_to_end(image_id)
+        while len(self._thumbnails) > self.max_thumbnails:
+            self._thumbnails.popitem(last=False)
+
+    def add(self, image_bytes: bytes) -> str:
+        """Guarda la imagen completa en disco y su miniatura; retorna el id"""
+        image_id = hashlib.sha256(image_bytes).hexdigest()[:32]
+        path = self._full_path(image_id)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, path)
+
+        thumbnail = self._make_thumbnail(image_bytes)
+        now = time.time()
+        with self._lock:
+            self._remember(image_id, thumbnail)
+            purge_due = now - self._last_purge >= self.purge_interval_seconds
+            if purge_due:
+                self._last_purge = now
+        if purge_due:
+            self._purge_expired()
+        return image_id
+
+    def thumbnail(self, image_id: str) -> Optional[bytes]:
+        """Miniatura WebP para el historial (None si la imagen ya no existe)"""
+        with self._lock:
+            thumbnail = self._thumbnails.get(image_id)
+            if thumbnail is not None:
+                self._thumbnails.move_to_end(image_id)
+                self.thumb_hits += 1
+                return thumbnail
+
+        full = self.read_full(image_id)
+        if full is None:
+            return None
+        thumbnail = self._make_thumbnail(full)
+        with self._lock:
+            self._remember(image_id, thumbnail)
+        return thumbnail
+
+    def read_full(self, image_id: str) -> Optional[bytes]:
+        """Bytes PNG originales para descarga"""
+        try:
+            with open(self._full_path(image_id), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _purge_expired(self) -> None:
+        """
+        Borra imágenes completas más antiguas que la retención.
+        Recorre el directorio fuera del lock y no toca los .tmp de escrituras en curso.
+        """
+        cutoff = time.time() - self.retention_seconds
+        removed = []
+        for name in os.listdir(self.base_dir):
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(self.base_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed.append(name[:-len(".png")])
+            except OSError:
+                pass
+
+        if removed:
+            with self._lock:
+                for image_id in removed:
+                    self._thumbnails.pop(image_id, None)
+            logger.info(f"Image history purged {len(removed)} expired images")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "thumbnails": len(self._thumbnails),
+                "thumbnail_bytes": sum(len(t) for t in self._thumbnails.values()),
+                "thumb_hits": self.thumb_hits,
+                "thumb_builds": self.thumb_builds
+            }
@@ -0,0 +1,184 @@
+"""
+Mejora de prompts de imagen con el modelo de texto barato.
+El resultado se memoriza en un LRU por prompt original; si el modelo no
+responde dentro del presupuesto de latencia se usa el sufijo estático.
+El prompt mejorado forma parte de la clave de la caché de imágenes, así que
+se genera con temperatura 0 y el LRU puede persistirse en disco (JSONL) para
+que la clave no cambie tras un reinicio.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATIC_SUFFIX = "digital art, high quality, detailed, 4k resolution, professional composition"
+
+ENHANCE_PROMPT = """Eres un experto en prompts para Amazon Titan Image Generator.
+Mejora el siguiente prompt siguiendo estas reglas:
+1. Añade detalles visuales específicos (sujeto, entorno, iluminación, colores)
+2. Incluye un estilo artístico apropiado y amigable para niños
+3. Especifica calidad y composición
+4. Mantén el significado original
+5. Escribe en inglés, máximo 60 palabras, una sola línea
+
+Prompt original: {prompt}
+
+Responde solo con el prompt mejorado, sin explicaciones."""
+
+
+def static_enhance(prompt: str) -> str:
+    """Mejora de respaldo: prompt original más el sufijo fijo"""
+    return f"{prompt}, {STATIC_SUFFIX}"
+
+
+class PromptEnhancer:
+    """
+    Mejora prompts con un LLM bajo un presupuesto de latencia.
+    Una respuesta que llega tarde igual se guarda en el LRU para la próxima vez.
+    persist_path: archivo JSONL donde se agregan las mejoras nuevas; se relee
+    al arrancar y se compacta cuando crece más de COMPACT_FACTOR veces el LRU.
+    """
+
+    COMPACT_FACTOR = 4
+
+    def __init__(self, bedrock_client, model_id: str, timeout_seconds: float = 2.5,
+                 max_entries: int = 256, max_tokens: int = 150, max_workers: int = 2,
+                 persist_path: Optional[str] = None):
+        self.bedrock_client = bedrock_client
+        self.model_id = model_id
+        self.timeout_seconds = timeout_seconds
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.persist_path = persist_path
+        self._persisted_lines = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prompt-enhancer")
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.errors = 0
+
+        if persist_path:
+            self._load()
+
+    def _load(self) -> None:
+        """Reconstruye el LRU desde el archivo (las líneas más nuevas ganan)"""
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, enhanced = json.loads(line)
+                    except ValueError:
+                        continue  # Línea cortada por un cierre abrupto
+                    self._persisted_lines += 1
+                    self._cache[key] = enhanced
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"Could not load prompt enhancements from {self.persist_path}: {e}")
+        logger.info(f"PromptEnhancer loaded {len(self._cache)} enhancements from disk")
+
+    def _persist(self, key: str, enhanced: str) -> None:
+        """Agrega una mejora al archivo; compacta al LRU actual si creció demasiado (requiere el lock)"""
+        try:
+            if self._persisted_lines >= self.COMPACT_FACTOR * self.max_entries:
+                tmp_path = f"{self.persist_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for cached_key, cached in self._cache.items():
+                        f.write(json.dumps([cached_key, cached], ensure_ascii=False) + "\n")
+                os.replace(tmp_path, self.persist_path)
+                self._persisted_lines = len(self._cache)
+            else:
+                with open(self.persist_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps([key, enhanced], ensure_ascii=False) + "\n")
+                self._persisted_lines += 1
+        except OSError as e:
+            logger.error(f"Could not persist prompt enhancement: {e}")
+
+    def enhance(self, prompt: str) -> str:
+        key = prompt.strip()
+        with self._lock:
+            enhanced = self._cache.get(key)
+            if enhanced is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return enhanced
+            self.misses += 1
+
+        future = self._executor.submit(self._call_model, key)
+        future.add_done_callback(lambda f: self._remember(key, f))
+        try:
+            enhanced = future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"Prompt enhancement over budget ({self.timeout_seconds}s), using static suffix")
+            return static_enhance(prompt)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.error(f"Prompt enhancement failed: {e}")
+            return static_enhance(prompt)
+
+        return enhanced or static_enhance(prompt)
+
+    def _remember(self, key: str, future: Future) -> None:
+        if future.exception() is not None or not future.result():
+            return
+        enhanced = future.result()
+        with self._lock:
+            is_new = self._cache.get(key) != enhanced
+            self._cache[key] = enhanced
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            if self.persist_path and is_new:
+                self._persist(key, enhanced)
+
+    def _call_model(self, prompt: str) -> str:
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": self.max_tokens,
+            # Determinista: el resultado es parte de la clave de la caché de imágenes
+            "temperature": 0,
+            "messages": [{"role": "user", "content": ENHANCE_PROMPT.format(prompt=prompt)}]
+        }
+
+        response = self.bedrock_client.invoke_model(
+            modelId=self.model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body)
+        )
+
+        response_body = json.loads(response['body'].read())
+        return response_body['content'][0]['text'].strip().strip('"')
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "timeouts": self.timeouts,
+                "errors": self.errors
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -1,12 +1,27 @@
 from langchain.tools import BaseTool
 from typing import Type, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Plantilla compilada una sola vez al importar el módulo
+ASK_GENERAL_PROMPT = PromptTemplate.from_template("""
+            Eres un asistente especializado en comunicación clara y literal.
+            
+            PREGUNTA: {question}
+            
+            Responde con:
+            1. Hechos concretos (números, fechas, nombres)
+            2. Oraciones cortas (máx 15 palabras)
+            3. Sin metáforas ni sarcasmo
+            4. Si no sabes: "No tengo información sobre eso."
+            
+            RESPUESTA LITERAL:
+            """)
+
 class AskGeneralInput(BaseModel):
     """Input para preguntas generales"""
     question: str = Field(description="Pregunta del usuario sobre USIL/SIU")
@@ -24,48 +39,55 @@ class AskGeneralTool(BaseTool):
     llm: Optional[any] = None
     memory: Optional[any] = None
     
+    # Cadena LCEL construida una vez por instancia
+    _chain: Optional[any] = PrivateAttr(default=None)
+    
     def __init__(self, llm=None, memory=None, **kwargs):
         super().__init__(**kwargs)
         self.llm = llm
         self.memory = memory
+        self._chain = ASK_GENERAL_PROMPT | llm | StrOutputParser() if llm else None
+    
+    def _postprocess(self, response: str) -> str:
+        """Post-procesamiento TEA"""
+        response = response.replace("¡", "").replace("¿", "")
+        response = response.replace(" fascinante ", " ")
+        response = response.replace(" increíble ", " ")
+        
+        # Añadir opción de expandir
+        response += "\n\n¿Quieres que explique esto paso a paso?"
+        
+        return response
     
     def _run(self, question: str) -> str:
         """Genera respuesta factual, literal, sin metáforas"""
         try:
-            prompt = PromptTemplate.from_template("""
-            Eres un asistente especializado en comunicación clara y literal.
-            
-            PREGUNTA: {question}
-            
-            Responde con:
-            1. Hechos concretos (números, fechas, nombres)
-            2. Oraciones cortas (máx 15 palabras)
-            3. Sin metáforas ni sarcasmo
-            4. Si no sabes: "No tengo información sobre eso."
-            
-            RESPUESTA LITERAL:
-            """)
-            
-            if self.llm:
-                chain = prompt | self.llm | StrOutputParser()
-                response = chain.invoke({"question": question})
+            if self._chain:
+                response = self._chain.invoke({"question": question})
             else:
                 response = "No tengo información sobre eso en este momento."
             
-            # Post-procesamiento TEA
-            response = response.replace("¡", "").replace("¿", "")
-            response = response.replace(" fascinante ", " ")
-            response = response.replace(" increíble ", " ")
-            
-            # Añadir opción de expandir
-            response += "\n\n¿Quieres que explique esto paso a paso?"
-            
-            return response
+            return self._postprocess(response)
             
         except Exception as e:
             logger.error(f"Error in ask_general: {e}")
             return "Lo siento, no pude procesar tu pregunta. Por favor intenta de nuevo."
     
     async def _arun(self, question: str) -> str:
-        """Versión async"""
-        return self._run(question)
\ No newline at end of file
+        """
+        Versión async para llamadores con event loop propio.
+        ChatBedrock no tiene cliente async nativo (boto3 vía BedrockInvoker):
+        ainvoke ejecuta la llamada síncrona en un hilo del executor, así que
+        no bloquea el loop pero sí ocupa un hilo mientras responde el modelo.
+        """
+        try:
+            if self._chain:
+                response = await self._chain.ainvoke({"question": question})
+            else:
+                response = "No tengo información sobre eso en este momento."
+            
+            return self._postprocess(response)
+            
+        except Exception as e:
+            logger.error(f"Error in ask_general (async): {e}")
+            return "Lo siento, no pude procesar tu pregunta. Por favor intenta de nuevo."
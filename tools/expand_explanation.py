@@ -1,11 +1,32 @@
 from langchain.tools import BaseTool
 from typing import Type, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Plantilla compilada una sola vez al importar el módulo
+EXPAND_EXPLANATION_PROMPT = PromptTemplate.from_template("""
+            Crea una explicación PASO A PASO sobre: {topic}
+            
+            Contexto conversacional: {context}
+            
+            FORMATO OBLIGATORIO:
+            1. [Primer paso concreto]
+            2. [Segundo paso concreto]  
+            3. [Tercer paso concreto]
+            ...
+            
+            Cada paso debe ser UNA acción específica.
+            No uses viñetas, solo números.
+            Máximo 6 pasos.
+            Usa lenguaje literal y claro.
+            
+            EXPLICACIÓN PASO A PASO:
+            """)
+
 class ExpandExplanationInput(BaseModel):
     """Input para expandir explicaciones"""
     topic: str = Field(description="Tema específico a expandir paso a paso")
@@ -22,49 +43,41 @@ class ExpandExplanationTool(BaseTool):
     
     llm: Optional[any] = None
     memory: Optional[any] = None
+    context_exchanges: int = 1
+    
+    # Cadena LCEL construida una vez por instancia
+    _chain: Optional[any] = PrivateAttr(default=None)
     
     def __init__(self, llm=None, memory=None, **kwargs):
         super().__init__(**kwargs)
         self.llm = llm
         self.memory = memory
+        self._chain = EXPAND_EXPLANATION_PROMPT | llm | StrOutputParser() if llm else None
+    
+    def _get_context(self, memory=None) -> str:
+        """
+        Últimos intercambios del historial (RAMConversationMemory).
+        Se lee a través de la vista de ventana, sin copiar toda la conversación.
+        """
+        memory = memory if memory is not None else self.memory
+        if memory is None:
+            return "No hay contexto previo"
+        
+        view = memory.window(self.context_exchanges)
+        return view.format() if len(view) else "No hay contexto previo"
     
-    def _run(self, topic: str) -> str:
-        """Genera explicación estructurada paso a paso"""
+    def _run(self, topic: str, memory=None) -> str:
+        """
+        Genera explicación estructurada paso a paso.
+        memory es la memoria de la sesión en curso; self.memory solo sirve
+        de respaldo cuando la tool no se comparte entre sesiones.
+        """
         try:
-            # Recuperar último mensaje del historial
-            context = "No hay contexto previo"
-            if self.memory:
-                history = self.memory.load_memory_variables({})
-                last_exchange = history.get("chat_history", [])
-                if last_exchange and len(last_exchange) > 0:
-                    context = str(last_exchange[-2:]) if len(last_exchange) >= 2 else str(last_exchange)
-            
-            prompt = PromptTemplate.from_template("""
-            Crea una explicación PASO A PASO sobre: {topic}
-            
-            Contexto conversacional: {context}
-            
-            FORMATO OBLIGATORIO:
-            1. [Primer paso concreto]
-            2. [Segundo paso concreto]  
-            3. [Tercer paso concreto]
-            ...
-            
-            Cada paso debe ser UNA acción específica.
-            No uses viñetas, solo números.
-            Máximo 6 pasos.
-            Usa lenguaje literal y claro.
-            
-            EXPLICACIÓN PASO A PASO:
-            """)
-            
-            if self.llm:
-                chain = prompt | self.llm
-                response = chain.invoke({
+            if self._chain:
+                return self._chain.invoke({
                     "topic": topic,
-                    "context": context
+                    "context": self._get_context(memory)
                 })
-                return response.content if hasattr(response, 'content') else str(response)
             else:
                 return f"Paso a paso para {topic}:\n1. Primero...\n2. Luego...\n3. Finalmente..."
             
@@ -72,6 +85,22 @@ class ExpandExplanationTool(BaseTool):
             logger.error(f"Error in expand_explanation: {e}")
             return f"No pude generar una explicación paso a paso para '{topic}'. Por favor intenta de nuevo."
     
-    async def _arun(self, topic: str) -> str:
-        """Versión async"""
-        return self._run(topic)
\ No newline at end of file
+    async def _arun(self, topic: str, memory=None) -> str:
+        """
+        Versión async para llamadores con event loop propio.
+        ChatBedrock no tiene cliente async nativo (boto3 vía BedrockInvoker):
+        ainvoke ejecuta la llamada síncrona en un hilo del executor, así que
+        no bloquea el loop pero sí ocupa un hilo mientras responde el modelo.
+        """
+        try:
+            if self._chain:
+                return await self._chain.ainvoke({
+                    "topic": topic,
+                    "context": self._get_context(memory)
+                })
+            else:
+                return f"Paso a paso para {topic}:\n1. Primero...\n2. Luego...\n3. Finalmente..."
+            
+        except Exception as e:
+            logger.error(f"Error in expand_explanation (async): {e}")
+            return f"No pude generar una explicación paso a paso para '{topic}'. Por favor intenta de nuevo."
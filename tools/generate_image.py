@@ -1,12 +1,15 @@
 from langchain.tools import BaseTool
-from typing import Type, Optional, Dict, Any
+from typing import Type, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 import json
 import base64
+import random
 from datetime import datetime
 import logging
 import sys
 from config.settings import settings
+from tools.image_result import ImageResult
+from services.prompt_enhancer import static_enhance
 
 logger = logging.getLogger(__name__)
 
@@ -27,34 +30,58 @@ class GenerateImageTool(BaseTool):
     image_repo: Optional[Any] = None
     max_images_per_day: int = settings.max_images_per_day
     
-    def __init__(self, bedrock_client=None, image_model_id=None, image_repo=None, max_images_per_day=5, **kwargs):
+    # Caché opcional de imágenes en disco
+    image_cache: Optional[Any] = None
+    cache_seed_buckets: int = 4
+    cache_charge_quota_on_hit: bool = True
+    
+    # Mejora de prompt con LLM (None = sufijo estático)
+    prompt_enhancer: Optional[Any] = None
+    
+    def __init__(self, bedrock_client=None, image_model_id=None, image_repo=None, max_images_per_day=5,
+                 image_cache=None, cache_seed_buckets=4, cache_charge_quota_on_hit=True,
+                 prompt_enhancer=None, **kwargs):
         super().__init__(**kwargs)
         self.bedrock_client = bedrock_client
         self.image_model_id = image_model_id or self.image_model_id
         self.image_repo = image_repo
         self.max_images_per_day = max_images_per_day
+        self.image_cache = image_cache
+        self.cache_seed_buckets = max(1, cache_seed_buckets)
+        self.cache_charge_quota_on_hit = cache_charge_quota_on_hit
+        self.prompt_enhancer = prompt_enhancer
        
-    def _run(self, prompt: str, session_id: str = "unknown", style: str = "digital art") -> str:
+    def _check_quota(self, session_id: str) -> Tuple[bool, int]:
+        """Consume un cupo del día; retorna (permitido, restantes)"""
+        if self.image_repo:
+            return self.image_repo.check_and_increment(session_id)
+        return True, self.max_images_per_day - 1
+    
+    def _quota_exceeded(self) -> ImageResult:
+        return ImageResult.failure(
+            f"You cannot generate more images today. Limit: {self.max_images_per_day}",
+            remaining=0
+        )
+    
+    def _run(self, prompt: str, session_id: str = "unknown", style: str = "digital art") -> ImageResult:
         """
-        Ejecuta generación con control de límite
+        Ejecuta generación con control de límite.
+        Retorna un ImageResult con los bytes de la imagen ya decodificados.
+        El límite diario se verifica antes de mejorar el prompt, salvo cuando un
+        acierto de caché no consume cupo: ahí hace falta la clave (prompt mejorado) primero.
         """
         try:
-            # Verificar límite
-            if self.image_repo:
-                allowed, remaining = self.image_repo.check_and_increment(session_id)
-            else:
-                allowed = True
-                remaining = self.max_images_per_day - 1
-            
-            if not allowed:
-                return json.dumps({
-                    "success": False,
-                    "message": f"You cannot generate more images today. Limit: {self.max_images_per_day}",
-                    "remaining": 0
-                })
+            quota_first = not (self.image_cache and not self.cache_charge_quota_on_hit)
+            if quota_first:
+                allowed, remaining = self._check_quota(session_id)
+                if not allowed:
+                    return self._quota_exceeded()
             
-            # Mejorar prompt
-            enhanced_prompt = f"{prompt}, digital art, high quality, detailed, 4k resolution, professional composition"
+            # Mejorar prompt (LLM con presupuesto de latencia o sufijo estático)
+            if self.prompt_enhancer:
+                enhanced_prompt = self.prompt_enhancer.enhance(prompt)
+            else:
+                enhanced_prompt = static_enhance(prompt)
 
             # Payload para Titan
             payload = {
@@ -70,20 +97,50 @@ class GenerateImageTool(BaseTool):
                 }
             }
             
+            # Caché: la semilla se elige entre N variantes para que los prompts repetidos coincidan
+            cache_key = None
+            cached_image = None
+            if self.image_cache:
+                seed_bucket = random.randrange(self.cache_seed_buckets)
+                config = payload["imageGenerationConfig"]
+                config["seed"] = seed_bucket
+                cache_key = self.image_cache.make_key(
+                    enhanced_prompt, config["width"], config["height"],
+                    config["cfgScale"], config["quality"], seed_bucket
+                )
+                cached_image = self.image_cache.get(cache_key)
+            
+            # Verificar límite (si no se verificó antes de la mejora)
+            if not quota_first:
+                if cached_image is not None:
+                    remaining = self.image_repo.get_remaining(session_id) if self.image_repo else self.max_images_per_day
+                else:
+                    allowed, remaining = self._check_quota(session_id)
+                    if not allowed:
+                        return self._quota_exceeded()
+            
+            if cached_image is not None:
+                logger.info("Image cache hit")
+                return ImageResult(
+                    success=True,
+                    message="Image generated ✅",
+                    image_bytes=cached_image,
+                    enhanced_prompt=enhanced_prompt,
+                    remaining=remaining,
+                    cached=True
+                )
+            
             # Modo desarrollo sin Bedrock
             if not self.bedrock_client:
-                import random
                 import string
                 dummy = ''.join(random.choices(string.ascii_letters, k=100))
-                img_b64 = base64.b64encode(dummy.encode()).decode('utf-8')
-                img_bytes = base64.b64decode(img_b64)
-                return json.dumps({
-                    "success": True,
-                    "image_data": img_bytes,
-                    "enhanced_prompt": enhanced_prompt,
-                    "remaining": remaining,
-                    "message": f"✅ Modo desarrollo. Te quedan {remaining} imágenes"
-                })
+                return ImageResult(
+                    success=True,
+                    message=f"✅ Modo desarrollo. Te quedan {remaining} imágenes",
+                    image_bytes=dummy.encode(),
+                    enhanced_prompt=enhanced_prompt,
+                    remaining=remaining
+                )
             
             # Invocar Bedrock
             response = self.bedrock_client.invoke_model(
@@ -94,21 +151,21 @@ class GenerateImageTool(BaseTool):
             )
             
             data = json.loads(response["body"].read())
-            img_b64 = data["images"][0]
-            return json.dumps({
-                "success": True,
-                "image_data": img_b64,
-                "enhanced_prompt": enhanced_prompt,
-                "remaining": remaining,
-                "message": f"Image generated ✅" # - Te quedan {remaining} imágenes hoy - {self.max_images_per_day}"
-            })
+            # Única decodificación base64 en todo el recorrido de la imagen
+            img_bytes = base64.b64decode(data["images"][0])
+            
+            if cache_key:
+                self.image_cache.put(cache_key, img_bytes)
+            return ImageResult(
+                success=True,
+                message=f"Image generated ✅", # - Te quedan {remaining} imágenes hoy - {self.max_images_per_day}"
+                image_bytes=img_bytes,
+                enhanced_prompt=enhanced_prompt,
+                remaining=remaining
+            )
             
         except Exception as e:
             exc_type, exc_obj, tb = sys.exc_info()
             line_number = tb.tb_lineno
             logger.error(f"Error generating image: {e}, line_number: {line_number }")
-            return json.dumps({
-                "success": False,
-                "message": f"Error: {str(e)}",
-                "error": str(e)
-            })
\ No newline at end of file
+            return ImageResult.failure(f"Error: {str(e)}", error=str(e))
\ No newline at end of file
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ImageResult:
+    """
+    Resultado tipado de una generación de imagen.
+    La imagen viaja como bytes crudos: se decodifica una sola vez al recibirla
+    de Titan y no se vuelve a serializar dentro del proceso.
+    """
+    success: bool
+    message: str
+    image_bytes: Optional[bytes] = None
+    enhanced_prompt: str = ""
+    remaining: Optional[int] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+    @classmethod
+    def failure(cls, message: str, error: Optional[str] = None, remaining: Optional[int] = None) -> "ImageResult":
+        return cls(success=False, message=message, error=error, remaining=remaining)
@@ -1,14 +1,146 @@
 import streamlit as st
-import json
 import logging
-from typing import Dict, Any
-import base64
+from typing import Dict, Any, Iterator
+import re
+import secrets
+import streamlit.components.v1 as components
 from core.orchestrator import ConversationOrchestrator
 from services.ip_utils import get_client_ip
 from services.dynamodb import ImageUsageRepository
+from services.image_history import ImageHistoryStore
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+IMAGE_POLL_SECONDS = 2
+SESSION_COOKIE = "tea_session"
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{32,64}$")
+
+@st.cache_resource
+def get_image_history() -> ImageHistoryStore:
+    """Process-wide image history (thumbnails in memory, full images on disk)"""
+    return ImageHistoryStore(
+        base_dir=settings.image_history_dir,
+        thumb_px=settings.image_history_thumb_px,
+        max_thumbnails=settings.image_history_max_thumbnails,
+        retention_seconds=settings.image_history_retention_hours * 3600
+    )
+
+def _render_history_image(msg: Dict[str, Any]):
+    """
+    Render a history image from its cached WebP thumbnail.
+    The full PNG is only read from disk when the user asks to download it.
+    """
+    history = get_image_history()
+    thumbnail = history.thumbnail(msg["image_id"])
+    if thumbnail is None:
+        st.caption("🖼️ Image no longer available")
+        return
+    st.image(thumbnail, width=200)
+    
+    # The same image can appear twice (cache hit), so widget keys use the job id
+    if msg.get("download_ready"):
+        full = history.read_full(msg["image_id"])
+        if full is not None:
+            st.download_button(
+                "💾 Save image",
+                data=full,
+                file_name=f"image_{msg['image_id'][:8]}.png",
+                mime="image/png",
+                key=f"download_{msg['job_id']}"
+            )
+    elif st.button("⬇️ Download", key=f"prepare_{msg['job_id']}"):
+        msg["download_ready"] = True
+        st.rerun()
+
+def _new_session_id() -> str:
+    """Random, unguessable session id: it is the only key to the stored transcript"""
+    return secrets.token_urlsafe(32)
+
+def _get_session_id() -> str:
+    """
+    Browser session id, restored from a first-party cookie.
+    It never goes in the URL: a shared or bookmarked link must not
+    give access to someone else's conversation.
+    """
+    if "session_id" not in st.session_state:
+        cookie = st.context.cookies.get(SESSION_COOKIE) or ""
+        st.session_state["session_id"] = cookie if SESSION_ID_PATTERN.match(cookie) else _new_session_id()
+    # Links from older versions carried the id in ?sid=; it is no longer honored
+    if "sid" in st.query_params:
+        del st.query_params["sid"]
+    return st.session_state["session_id"]
+
+def _store_session_cookie(session_id: str):
+    """Write the session cookie once per id (Streamlit can only read cookies)"""
+    if st.session_state.get("session_cookie") == session_id:
+        return
+    max_age = settings.conversation_store_ttl_seconds
+    components.html(
+        "<script>parent.document.cookie = "
+        f"'{SESSION_COOKIE}={session_id}; path=/; max-age={max_age}; SameSite=Strict'"
+        " + (parent.location.protocol === 'https:' ? '; Secure' : '');</script>",
+        height=0
+    )
+    st.session_state["session_cookie"] = session_id
+
+@st.fragment(run_every=IMAGE_POLL_SECONDS)
+def _render_image_job(orchestrator: ConversationOrchestrator, msg: Dict[str, Any]):
+    """
+    Poll a background image job without blocking the chat.
+    Only this fragment reruns while the job is pending; once it finishes,
+    the history message is replaced by the image (or error) and the app reruns.
+    """
+    job = orchestrator.get_image_job(msg["job_id"])
+    
+    if job is None:
+        msg.update({"type": "error", "content": "The image is no longer available. Please try again."})
+        st.rerun()
+    
+    if job["state"] in ("queued", "running"):
+        st.info(f"🎨 Generating image... ({job['state']})")
+        st.caption(f"📝 Prompt: {job['prompt']}")
+        return
+    
+    result = job.get("result")
+    image_id = None
+    if job["state"] == "done" and result is not None and result.success:
+        try:
+            image_id = get_image_history().add(result.image_bytes)
+        except Exception as e:
+            logger.error(f"Error storing image in history: {e}")
+    
+    if image_id:
+        # Only the image id stays in session state, never the full PNG
+        msg.update({
+            "type": "image",
+            "content": result.message,
+            "image_id": image_id,
+            "prompt": result.enhanced_prompt
+        })
+    else:
+        msg.update({
+            "type": "error",
+            "content": (result.message if result is not None and not result.success else None)
+                       or job.get("error") or "Error generating image"
+        })
+    st.rerun()
+
+def _render_stream(events: Iterator[Dict[str, Any]], placeholder) -> Dict[str, Any]:
+    """
+    Consume the orchestrator event stream.
+    Text chunks are written to the placeholder as they arrive.
+    Returns the final "done" event.
+    """
+    streamed_text = ""
+    for event in events:
+        if event.get("type") == "chunk":
+            streamed_text += event["text"]
+            placeholder.markdown(streamed_text + "▌")
+        else:
+            return event
+    return {"response": streamed_text}
+
 def render_tea_chat_interface(orchestrator: ConversationOrchestrator):
     """
     TEA-optimized chat interface:
@@ -92,6 +224,12 @@ def render_tea_chat_interface(orchestrator: ConversationOrchestrator):
     client_ip = get_client_ip()
     st.session_state["client_ip"] = client_ip
     
+    # Browser session ID: the orchestrator is shared by all sessions,
+    # several students can share the same IP.
+    # Kept in a cookie so a reload after a restart finds the stored conversation
+    session_id = _get_session_id()
+    _store_session_cookie(session_id)
+    
     # TEA control panel (SIMPLE)
     with st.sidebar:
         
@@ -135,7 +273,7 @@ def render_tea_chat_interface(orchestrator: ConversationOrchestrator):
         
         # Session information
         st.header("📋 Current session")
-        stats = orchestrator.get_session_stats(client_ip)
+        stats = orchestrator.get_session_stats(session_id)
         #st.caption(f"Messages: {stats.get('message_count', 0)}")
         st.caption(f"IP: {client_ip[:15]}..." if len(client_ip) > 15 else f"IP: {client_ip}")
         
@@ -157,22 +295,27 @@ def render_tea_chat_interface(orchestrator: ConversationOrchestrator):
             - "create an image..."
             """)
     
-    # Initialize history in RAM
+    # Initialize history (restored from the stored conversation after a restart)
     if "tea_messages" not in st.session_state:
-        st.session_state.tea_messages = []
+        st.session_state.tea_messages = [
+            {"role": msg["role"], "content": msg["content"], "type": "text"}
+            for msg in orchestrator.get_session_messages(session_id)
+        ]
     
     # Show history (SIMPLE, no complex avatars)
     for msg in st.session_state.tea_messages:
         with st.chat_message(msg["role"]):
             if msg.get("type") == "image":
                 # Show image
-                if "image_data" in msg:
-                    images_out = base64.b64decode(msg["image_data"])
-                    st.image(images_out, width=200)
+                if "image_id" in msg:
+                    _render_history_image(msg)
                 if "prompt" in msg:
                     st.caption(f"📝 Prompt: {msg['prompt']}")
                 if "content" in msg:
                     st.success(msg["content"])
+            elif msg.get("type") == "image_job":
+                # Image still being generated in the background
+                _render_image_job(orchestrator, msg)
             else:
                 # Text message
                 st.markdown(msg["content"])
@@ -198,44 +341,39 @@ def render_tea_chat_interface(orchestrator: ConversationOrchestrator):
         
         # Process with orchestrator
         with st.chat_message("assistant"):
+            placeholder = st.empty()
             with st.spinner("Processing..."):
                 try:
-                    # Execute agent
-                    response = orchestrator.handle_message(prompt, client_ip)
+                    # Execute agent (streaming)
+                    response = _render_stream(
+                        orchestrator.handle_message_stream(prompt, session_id, user_id=client_ip),
+                        placeholder
+                    )
                     
-                    # Check if it's an image response
                     response_text = response.get("response", "")
                     
-                    try:
-                        # Try to parse as JSON (image)
-                        img_data = json.loads(response_text)
-                        if img_data.get("success"):
-                            # Show image
-                            images_out = base64.b64decode(img_data["image_data"])
-                            st.image(images_out, use_container_width=True)
-                            st.caption(f"📝 Enhanced prompt: {img_data.get('enhanced_prompt', '')}")
-                            st.success(img_data.get("message", "✅ Image generated"))
-                           
-                            # Save to history
-                            st.session_state.tea_messages.append({
+                    if response.get("tool_used") == "generate_image":
+                        if response.get("image_job_id"):
+                            # Image queued: poll it without blocking the chat
+                            job_msg = {
                                 "role": "assistant",
-                                "type": "image",
-                                "content": img_data.get("message", ""),
-                                "image_data": img_data["image_data"],
-                                "prompt": img_data.get("enhanced_prompt", "")
-                            })
+                                "type": "image_job",
+                                "job_id": response["image_job_id"]
+                            }
+                            st.session_state.tea_messages.append(job_msg)
+                            _render_image_job(orchestrator, job_msg)
                         else:
                             # Generation error
-                            error_msg = img_data.get("message", "Error generating image")
+                            error_msg = response_text or "Error generating image"
                             st.error(error_msg)
                             st.session_state.tea_messages.append({
                                 "role": "assistant",
                                 "content": error_msg,
                                 "type": "error"
                             })
-                    except json.JSONDecodeError:
-                        # It's a normal text response
-                        st.markdown(response_text)
+                    else:
+                        # It's a normal text response (final formatted version)
+                        placeholder.markdown(response_text)
                         st.session_state.tea_messages.append({
                             "role": "assistant",
                             "content": response_text,
@@ -263,5 +401,7 @@ def render_tea_chat_interface(orchestrator: ConversationOrchestrator):
         with col2:
             if st.button("🗑️ New conversation", use_container_width=True, type="primary"):
                 st.session_state.tea_messages = []
-                orchestrator.reset_session(client_ip)
+                orchestrator.reset_session(session_id)
+                # Fresh id: the old conversation is not restored from the cookie
+                st.session_state["session_id"] = _new_session_id()
                 st.rerun()
\ No newline at end of file